@@ -0,0 +1,286 @@
+"""Benchmarks for the MCP Alchemy server's hot paths against latest_db.db.
+
+Each case calls one tool repeatedly, in-process (the tool functions directly) and/or over the
+HTTP transport (a server subprocess, or --url for one already running), and reports latency
+percentiles, throughput, output size and peak RSS. Results are written as JSON; pass an
+earlier file to --compare to see how the current tree moved against it.
+
+    python bench.py --mode both --iterations 50
+    python bench.py --compare bench_results/<earlier>.json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import resource
+import subprocess
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, inspect
+
+### Cases ###
+
+DB_URL = "sqlite:///latest_db.db"
+SERVER_URL = "http://127.0.0.1:8080/mcp"
+RESULTS_DIR = "bench_results"
+
+# Tables of latest_db.db with a known shape: many rows, and many columns
+LARGE_TABLE = "attachment"
+WIDE_TABLE = "pipeline_version"
+
+
+def build_cases():
+    """Return [(case name, tool name, arguments)] for the tools and result shapes benchmarked"""
+    engine = create_engine(DB_URL)
+    with engine.connect() as conn:
+        table_names = sorted(inspect(conn).get_table_names())
+    engine.dispose()
+
+    cases = [
+        ("all_table_names", "all_table_names", {}),
+        ("filter_table_names", "filter_table_names", {"q": "pipeline version"}),
+    ]
+    for count in (1, 10, 100):
+        cases.append(
+            (
+                f"schema_definitions_{count}",
+                "schema_definitions",
+                {"table_names": table_names[:count]},
+            )
+        )
+    cases += [
+        (
+            "execute_query_small",
+            "execute_query",
+            {"query": f"SELECT * FROM {LARGE_TABLE} WHERE id = :id", "params": {"id": 2}},
+        ),
+        (
+            "execute_query_large",
+            "execute_query",
+            {"query": f"SELECT id, name FROM {LARGE_TABLE} ORDER BY id", "format": "tsv"},
+        ),
+        (
+            "execute_query_wide",
+            "execute_query",
+            {"query": f"SELECT * FROM {WIDE_TABLE} ORDER BY id LIMIT 20"},
+        ),
+    ]
+    return cases
+
+
+### Measurement ###
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def measure(call, iterations, concurrency):
+    """Time `iterations` awaits of call(), at most `concurrency` at once.
+
+    The first call is timed apart since it fills the server's caches.
+    """
+    started = time.perf_counter()
+    output = await call()
+    first_ms = (time.perf_counter() - started) * 1000
+
+    slots = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def timed():
+        nonlocal errors
+        async with slots:
+            started = time.perf_counter()
+            text = await call()
+            latencies.append((time.perf_counter() - started) * 1000)
+            if text.startswith("Error:"):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed() for _ in range(iterations)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "first_ms": round(first_ms, 3),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "throughput_per_s": round(iterations / elapsed, 1),
+        "output_chars": len(output),
+        "errors": errors + output.startswith("Error:"),
+    }
+
+
+def peak_rss_kb(pid=None):
+    """Peak resident set size of this process (or another one, on Linux) in KB"""
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+### Modes ###
+
+
+async def run_in_process(cases, iterations, concurrency):
+    import sql_server
+
+    results = []
+    for name, tool_name, arguments in cases:
+        tool = getattr(sql_server, tool_name)
+        fn = getattr(tool, "fn", tool)  # FastMCP wraps decorated tools
+        result = await measure(lambda: fn(**arguments), iterations, concurrency)
+        results.append({"case": name, "mode": "in_process", **result})
+        print(format_result(results[-1]), flush=True)
+    return results, peak_rss_kb()
+
+
+def wait_for_port(url, timeout):
+    host, port = url.split("//", 1)[1].split("/", 1)[0].split(":")
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, int(port)), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Server at {url} did not start within {timeout}s")
+
+
+async def run_over_http(cases, iterations, concurrency, url):
+    from fastmcp import Client
+
+    server = None
+    if url is None:
+        url = SERVER_URL
+        server = subprocess.Popen(
+            [sys.executable, "sql_server.py"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    try:
+        wait_for_port(url, 60)
+        results = []
+        async with Client(url) as client:
+
+            async def call_tool(tool_name, arguments):
+                result = await client.call_tool(tool_name, arguments, raise_on_error=False)
+                return "".join(getattr(content, "text", "") for content in result.content)
+
+            for name, tool_name, arguments in cases:
+                result = await measure(
+                    lambda: call_tool(tool_name, arguments), iterations, concurrency
+                )
+                results.append({"case": name, "mode": "http", **result})
+                print(format_result(results[-1]), flush=True)
+        return results, peak_rss_kb(server.pid) if server else None
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+### Reporting ###
+
+
+def format_result(result):
+    return (
+        f"{result['mode']:<10} {result['case']:<24} p50 {result['p50_ms']:>9.2f}ms  "
+        f"p95 {result['p95_ms']:>9.2f}ms  p99 {result['p99_ms']:>9.2f}ms  "
+        f"{result['throughput_per_s']:>8.1f}/s  {result['output_chars']:>7} chars"
+        + (f"  {result['errors']} errors" if result["errors"] else "")
+    )
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline_path):
+    """Print p50 and throughput changes of each case against an earlier report"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["mode"], r["case"]): r for r in baseline["results"]}
+    print(f"\nAgainst {baseline_path} (commit {baseline.get('commit')}):")
+    for result in report["results"]:
+        before = previous.get((result["mode"], result["case"]))
+        if before is None:
+            continue
+        p50 = (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0
+        throughput = (
+            (result["throughput_per_s"] - before["throughput_per_s"]) / before["throughput_per_s"] * 100
+            if before["throughput_per_s"]
+            else 0
+        )
+        print(
+            f"{result['mode']:<10} {result['case']:<24} p50 {p50:+7.1f}%  throughput {throughput:+7.1f}%"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", choices=["in_process", "http", "both"], default="both")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--url", help="benchmark a running server instead of starting one")
+    parser.add_argument("--output", help=f"JSON report path (default: {RESULTS_DIR}/<commit>-<time>.json)")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    cases = build_cases()
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "iterations": args.iterations,
+        "concurrency": args.concurrency,
+        "results": [],
+        "peak_rss_kb": {},
+    }
+    if args.mode in ("in_process", "both"):
+        results, rss = asyncio.run(run_in_process(cases, args.iterations, args.concurrency))
+        report["results"] += results
+        report["peak_rss_kb"]["in_process"] = rss
+    if args.mode in ("http", "both"):
+        results, rss = asyncio.run(
+            run_over_http(cases, args.iterations, args.concurrency, args.url)
+        )
+        report["results"] += results
+        report["peak_rss_kb"]["http_server"] = rss
+    print(f"Peak RSS: {report['peak_rss_kb']}")
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{report['commit'] or 'nogit'}-{stamp}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
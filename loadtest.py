@@ -0,0 +1,215 @@
+"""Load test for the MCP Alchemy HTTP server with many concurrent MCP sessions.
+
+Starts a local server on latest_db.db (or targets --url), then for each concurrency level
+opens that many MCP client sessions which replay a weighted mix of bench.py's tool calls for
+--duration seconds. Each level reports throughput, latency percentiles, errors and the pool
+checkout timeouts the server counted (from its pool_stats tool); the first level that stops
+scaling is reported as the saturation point. Results are written as JSON.
+
+All sessions run in this one process; at high levels check that it is not the bottleneck
+(its CPU use against the server's) before reading the numbers as the server's limit.
+
+    python loadtest.py --clients 10,50,100,200 --duration 20
+    python loadtest.py --mix execute_query_small=6,schema_definitions_10=2 --server-env POOL_MODE=adaptive
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from collections import Counter
+from datetime import datetime, timezone
+
+from bench import RESULTS_DIR, SERVER_URL, build_cases, git_commit, percentile, wait_for_port
+
+DEFAULT_MIX = (
+    "execute_query_small=5,execute_query_large=2,execute_query_wide=1,"
+    "schema_definitions_10=2,filter_table_names=2,all_table_names=1"
+)
+# A level saturates when throughput grows less than this factor over the previous level...
+MIN_SCALING = 1.1
+# ...or more than this share of its calls fail
+MAX_ERROR_RATE = 0.01
+
+
+def parse_mix(mix, cases):
+    """Return [(case name, tool name, arguments, weight)] for 'case=weight,...'"""
+    by_name = {name: (tool_name, arguments) for name, tool_name, arguments in cases}
+    parsed = []
+    for part in mix.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in by_name:
+            raise SystemExit(f"Unknown case '{name}', choose from: {', '.join(by_name)}")
+        parsed.append((name, *by_name[name], float(weight or 1)))
+    return parsed
+
+
+def error_kind(text):
+    """Short label for an error, so identical failures are counted together"""
+    if "QueuePool limit" in text or "PoolTimeoutError" in text:
+        return "pool timeout"
+    return text.split("\n", 1)[0][:80]
+
+
+### Load ###
+
+
+async def read_pool_stats(client):
+    result = await client.call_tool("pool_stats", {}, raise_on_error=False)
+    try:
+        return json.loads("".join(getattr(content, "text", "") for content in result.content))
+    except ValueError:
+        return {}
+
+
+async def run_session(url, mix, deadline, calls):
+    """One simulated MCP client: a session replaying random calls from the mix until deadline"""
+    from fastmcp import Client
+
+    weights = [weight for *_, weight in mix]
+    try:
+        async with Client(url) as client:
+            while time.monotonic() < deadline:
+                name, tool_name, arguments, _ = random.choices(mix, weights)[0]
+                started = time.perf_counter()
+                try:
+                    result = await client.call_tool(tool_name, arguments, raise_on_error=False)
+                    text = "".join(getattr(content, "text", "") for content in result.content)
+                    failed = result.is_error or text.startswith("Error:")
+                except Exception as e:
+                    text, failed = f"{type(e).__name__}: {e}", True
+                latency = (time.perf_counter() - started) * 1000
+                calls.append((name, latency, error_kind(text) if failed else None))
+    except Exception as e:
+        calls.append(("session", 0.0, error_kind(f"{type(e).__name__}: {e}")))
+
+
+async def run_level(url, clients, duration, mix):
+    from fastmcp import Client
+
+    async with Client(url) as monitor:
+        before = await read_pool_stats(monitor)
+        calls = []
+        started = time.monotonic()
+        await asyncio.gather(
+            *(run_session(url, mix, started + duration, calls) for _ in range(clients))
+        )
+        elapsed = time.monotonic() - started
+        after = await read_pool_stats(monitor)
+
+    latencies = sorted(latency for name, latency, error in calls if name != "session")
+    errors = Counter(error for _, _, error in calls if error)
+    by_case = {}
+    for name, *_ in mix:
+        case_latencies = sorted(latency for case, latency, _ in calls if case == name)
+        if case_latencies:
+            by_case[name] = {
+                "calls": len(case_latencies),
+                "p95_ms": round(percentile(case_latencies, 0.95), 2),
+            }
+    return {
+        "clients": clients,
+        "calls": len(latencies),
+        "throughput_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 2) if latencies else None,
+        "max_ms": round(latencies[-1], 2) if latencies else None,
+        "errors": sum(errors.values()),
+        "error_kinds": dict(errors.most_common(5)),
+        "pool_timeouts": after.get("timeouts", 0) - before.get("timeouts", 0),
+        "pool_peak_checked_out": after.get("peak_checked_out"),
+        "by_case": by_case,
+    }
+
+
+def find_saturation(levels):
+    """The first level that scaled poorly over the previous one, failed calls or hit pool timeouts"""
+    previous = None
+    for level in levels:
+        error_rate = level["errors"] / max(1, level["calls"])
+        if (
+            error_rate > MAX_ERROR_RATE
+            or level["pool_timeouts"] > 0
+            or (previous and level["throughput_per_s"] < previous["throughput_per_s"] * MIN_SCALING)
+        ):
+            return level["clients"]
+        previous = level
+    return None
+
+
+def format_level(level):
+    return (
+        f"{level['clients']:>4} clients  {level['calls']:>6} calls  {level['throughput_per_s']:>8.1f}/s  "
+        f"p50 {level['p50_ms'] or 0:>8.1f}ms  p95 {level['p95_ms'] or 0:>8.1f}ms  "
+        f"p99 {level['p99_ms'] or 0:>8.1f}ms  errors {level['errors']:>5}  "
+        f"pool timeouts {level['pool_timeouts']:>4}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", default="10,50,100,200", help="concurrency levels, comma separated")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="bench.py cases with weights, case=weight,...")
+    parser.add_argument("--url", help="load a running server instead of starting one")
+    parser.add_argument(
+        "--server-env", action="append", default=[], help="KEY=VALUE for the started server"
+    )
+    parser.add_argument("--output", help=f"JSON report path (default: {RESULTS_DIR}/load-<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix, build_cases())
+    levels = [int(clients) for clients in args.clients.split(",")]
+
+    server, url = None, args.url
+    if url is None:
+        url = SERVER_URL
+        env = dict(os.environ, **dict(item.split("=", 1) for item in args.server_env))
+        server = subprocess.Popen(
+            [sys.executable, "sql_server.py"],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    try:
+        wait_for_port(url, 60)
+        results = []
+        for clients in levels:
+            results.append(asyncio.run(run_level(url, clients, args.duration, mix)))
+            print(format_level(results[-1]), flush=True)
+            for kind, count in results[-1]["error_kinds"].items():
+                print(f"      {count:>6} x {kind}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    saturation = find_saturation(results)
+    print(f"Saturation: {f'{saturation} clients' if saturation else 'not reached'}")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "duration_s": args.duration,
+        "mix": args.mix,
+        "server_env": args.server_env,
+        "levels": results,
+        "saturation_clients": saturation,
+    }
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"load-{report['commit'] or 'nogit'}-{stamp}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
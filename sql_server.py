@@ -1,18 +1,229 @@
 import os
+import re
+import csv
+import gzip
+import io
 import json
+import asyncio
+import hashlib
+import functools
+import contextvars
+import sqlite3
+import secrets
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict, deque, namedtuple
+from contextlib import contextmanager
+from itertools import chain, islice
 from datetime import datetime, date
 
 from fastmcp import FastMCP
 from fastmcp.utilities.logging import get_logger
+from starlette.responses import PlainTextResponse
 
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import create_engine, event, inspect, make_url, text
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.engine.reflection import ObjectKind
+from sqlalchemy.pool import NullPool
 
-os.environ["DB_URL"] = "sqlite:///latest_db.db"
+# Startup report "import" phase: the module's own code, after the imports above
+IMPORT_STARTED = time.perf_counter()
+
+os.environ.setdefault("DB_URL", "sqlite:///latest_db.db")
 
 
 ### Database ###
 logger = get_logger(__name__)
 ENGINE = None
+ENGINE_LOCK = threading.Lock()
+# Startup phase -> duration in ms, reported via the stats://startup resource
+STARTUP_TIMINGS = {}
+
+
+def record_startup_phase(phase, started):
+    """Record how long a startup phase took, keeping only its first occurrence"""
+    STARTUP_TIMINGS.setdefault(phase, round((time.perf_counter() - started) * 1000, 3))
+
+# Drivers that make DB_URL select async mode (AsyncEngine + async tool execution)
+ASYNC_DRIVERS = {
+    "aiosqlite",
+    "asyncpg",
+    "psycopg_async",
+    "aiomysql",
+    "asyncmy",
+    "aioodbc",
+    "oracledb_async",
+}
+
+
+def is_async_url(db_url):
+    return bool(db_url) and make_url(db_url).get_driver_name() in ASYNC_DRIVERS
+
+
+class Histogram:
+    """Latency histogram with fixed millisecond bucket bounds"""
+
+    BOUNDS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self, bounds_ms=None):
+        self.bounds_ms = bounds_ms or self.BOUNDS_MS
+        self.counts = [0] * (len(self.bounds_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        index = next(
+            (i for i, bound in enumerate(self.bounds_ms) if ms <= bound),
+            len(self.bounds_ms),
+        )
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"<={bound}ms" for bound in self.bounds_ms] + [
+                f">{self.bounds_ms[-1]}ms"
+            ]
+            return {
+                "count": self.count,
+                "total_ms": round(self.total_ms, 3),
+                "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+                "max_ms": round(self.max_ms, 3),
+                "buckets": dict(zip(labels, self.counts)),
+            }
+
+    def cumulative(self):
+        """Return ([(upper bound in seconds, observations up to it)], count, sum in seconds)"""
+        with self._lock:
+            buckets, total = [], 0
+            for bound, count in zip(self.bounds_ms, self.counts):
+                total += count
+                buckets.append((bound / 1000, total))
+            return buckets, self.count, self.total_ms / 1000
+
+
+class PoolStats:
+    """Connection pool usage counters, fed by pool events and get_connection timings"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.peak_checked_out = 0
+        self.checkout_latency = Histogram()
+        self._lock = threading.Lock()
+
+    def install(self, engine):
+        """Attach pool event listeners to a (sync or async) engine"""
+        pool = getattr(engine, "sync_engine", engine).pool
+
+        @event.listens_for(pool, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            checked_out = pool.checkedout() if hasattr(pool, "checkedout") else 0
+            with self._lock:
+                self.checkouts += 1
+                self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+        @event.listens_for(pool, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            with self._lock:
+                self.checkins += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, engine):
+        result = {"pool_mode": POOL_MODE}
+        if engine is not None:
+            pool = getattr(engine, "sync_engine", engine).pool
+            result["pool_class"] = type(pool).__name__
+            for name in ("size", "checkedout", "checkedin", "overflow"):
+                if hasattr(pool, name):
+                    result[name] = getattr(pool, name)()
+            result["status"] = pool.status()
+        with self._lock:
+            result.update(
+                checkouts=self.checkouts,
+                checkins=self.checkins,
+                timeouts=self.timeouts,
+                peak_checked_out=self.peak_checked_out,
+            )
+        result["checkout_latency"] = self.checkout_latency.snapshot()
+        return result
+
+
+POOL_STATS = PoolStats()
+# "fixed" keeps the minimal single-client pool, "adaptive" sizes it from POOL_EXPECTED_CONCURRENCY
+POOL_MODE = os.environ.get("POOL_MODE", "fixed").lower()
+POOL_EXPECTED_CONCURRENCY = int(os.environ.get("POOL_EXPECTED_CONCURRENCY", 10))
+
+
+def pool_options():
+    """Pool sizing for the configured POOL_MODE"""
+    if POOL_MODE == "adaptive":
+        concurrency = max(1, POOL_EXPECTED_CONCURRENCY)
+        return {
+            # One steady connection per expected concurrent request
+            "pool_size": concurrency,
+            # Absorb bursts of up to 50% above the expected concurrency
+            "max_overflow": max(2, concurrency // 2),
+            "pool_timeout": float(os.environ.get("POOL_TIMEOUT", 30)),
+        }
+    return {
+        # Keep minimal connections (MCP typically handles one request at a time)
+        "pool_size": 1,
+        # Allow temporary burst capacity for edge cases
+        "max_overflow": 2,
+    }
+
+
+def pool_free_connections(engine):
+    """Connections the engine's pool can still hand out without waiting, or None if unbounded"""
+    pool = getattr(engine, "sync_engine", engine).pool
+    if not hasattr(pool, "checkedout") or not hasattr(pool, "size"):
+        return None  # e.g. NullPool or StaticPool
+    max_overflow = getattr(pool, "_max_overflow", pool_options()["max_overflow"])
+    if max_overflow < 0:
+        return None
+    # Held continuation cursors count as checked out
+    return max(0, pool.size() + max_overflow - pool.checkedout())
+
+
+# Dialects known not to support MySQL-style "SET @var" session variables
+NO_SESSION_VARIABLE_DIALECTS = {"sqlite", "postgresql", "mssql", "oracle"}
+
+
+def install_session_setup(engine):
+    """Set session variables once per physical connection instead of on every checkout.
+
+    Support is decided per engine from the dialect; unknown dialects are tried on the first
+    connection and skipped from then on if that fails.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    supported = [sync_engine.dialect.name not in NO_SESSION_VARIABLE_DIALECTS]
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        if not supported[0]:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            # VERSION is defined in the constants section below
+            cursor.execute(f"SET @mcp_alchemy_version = '{VERSION}'")
+        except Exception as e:
+            # Some databases don't support session variables
+            logger.info(f"Session variables not supported, skipping: {e}")
+            supported[0] = False
+        finally:
+            cursor.close()
 
 
 def create_new_engine():
@@ -26,171 +237,2137 @@ def create_new_engine():
         "isolation_level": "AUTOCOMMIT",
         # Test connections before use (handles MySQL 8hr timeout, network drops)
         "pool_pre_ping": True,
-        # Keep minimal connections (MCP typically handles one request at a time)
-        "pool_size": 1,
-        # Allow temporary burst capacity for edge cases
-        "max_overflow": 2,
+        **pool_options(),
         # Force refresh connections older than 1hr (well under MySQL's 8hr default)
         "pool_recycle": 3600,
         # User can override any of the above
         **user_options,
     }
 
-    # Ensure DB_URL is set
-    db_url = os.environ.get("DB_URL")
-    if not db_url:
-        raise ValueError(
-            "DB_URL environment variable is not set. Please set it to your database connection string."
-        )
-    return create_engine(db_url, **options)
+    # Ensure DB_URL is set
+    db_url = os.environ.get("DB_URL")
+    if not db_url:
+        raise ValueError(
+            "DB_URL environment variable is not set. Please set it to your database connection string."
+        )
+    if is_async_url(db_url):
+        engine = create_async_engine(db_url, **options)
+    else:
+        engine = create_engine(db_url, **options)
+    POOL_STATS.install(engine)
+    install_session_setup(engine)
+    return engine
+
+
+def connect(engine):
+    """Check a connection out of the engine's pool, recording checkout latency"""
+    started = time.perf_counter()
+    try:
+        return engine.connect()
+    except PoolTimeoutError:
+        POOL_STATS.record_timeout()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        POOL_STATS.checkout_latency.observe(elapsed)
+        record_phase("connect", elapsed)
+
+
+async def connect_async(engine):
+    """Async mode counterpart of connect, returning a started AsyncConnection"""
+    started = time.perf_counter()
+    try:
+        return await engine.connect().start()
+    except PoolTimeoutError:
+        POOL_STATS.record_timeout()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        POOL_STATS.checkout_latency.observe(elapsed)
+        record_phase("connect", elapsed)
+
+
+def get_engine():
+    """Return ENGINE, creating it on first use"""
+    global ENGINE
+
+    if ENGINE is None:
+        with ENGINE_LOCK:
+            if ENGINE is None:
+                started = time.perf_counter()
+                ENGINE = create_new_engine()
+                record_startup_phase("create_engine", started)
+    return ENGINE
+
+
+def get_connection():
+    global ENGINE
+
+    if LAZY_INIT and DB_INFO is None:
+        # Lazy mode: the first database use also resolves DB_INFO in the background
+        start_warm_up()
+
+    try:
+        try:
+            connection = connect(get_engine())
+
+            return connection
+
+        except PoolTimeoutError:
+            # Pool exhausted by concurrent requests, a fresh engine would not help
+            raise
+        except Exception as e:
+            logger.warning(f"First connection attempt failed: {e}")
+
+            # Database might have restarted or network dropped - start fresh
+            if ENGINE is not None:
+                try:
+                    ENGINE.dispose()
+                except Exception:
+                    pass
+
+            # One retry with fresh engine handles most transient failures
+            ENGINE = create_new_engine()
+            connection = connect(ENGINE)
+
+            return connection
+
+    except PoolTimeoutError as e:
+        logger.warning(f"Timed out waiting for a pooled connection: {e}")
+        raise
+    except Exception as e:
+        logger.exception("Failed to get database connection after retry")
+        raise
+
+
+async def get_async_connection():
+    """Async mode counterpart of get_connection, returning a started AsyncConnection"""
+    global ENGINE
+
+    if LAZY_INIT and DB_INFO is None:
+        start_warm_up()
+
+    try:
+        try:
+            return await connect_async(get_engine())
+
+        except PoolTimeoutError:
+            # Pool exhausted by concurrent requests, a fresh engine would not help
+            raise
+        except Exception as e:
+            logger.warning(f"First connection attempt failed: {e}")
+
+            # Database might have restarted or network dropped - start fresh
+            if ENGINE is not None:
+                try:
+                    await ENGINE.dispose()
+                except Exception:
+                    pass
+
+            # One retry with fresh engine handles most transient failures
+            ENGINE = create_new_engine()
+            return await connect_async(ENGINE)
+
+    except PoolTimeoutError as e:
+        logger.warning(f"Timed out waiting for a pooled connection: {e}")
+        raise
+    except Exception as e:
+        logger.exception("Failed to get database connection after retry")
+        raise
+
+
+def raw_driver_connection(connection):
+    """The DBAPI connection of a (sync) SQLAlchemy connection, unwrapping aiosqlite's"""
+    driver_connection = connection.connection.driver_connection
+    # aiosqlite wraps the sqlite3 connection, whose interrupt() is safe from any thread
+    return getattr(driver_connection, "_conn", driver_connection)
+
+
+def kill_query(url, thread_id):
+    """Kill a MySQL query from a connection of its own, as the pool may be exhausted"""
+    engine = create_engine(url, poolclass=NullPool)
+    try:
+        with engine.connect() as killer:
+            killer.execute(text(f"KILL QUERY {int(thread_id)}"))
+    finally:
+        engine.dispose()
+
+
+async def kill_query_async(url, thread_id):
+    """kill_query for async drivers, or in a worker thread for sync ones"""
+    if not is_async_url(url):
+        return await asyncio.to_thread(kill_query, url, thread_id)
+    engine = create_async_engine(url, poolclass=NullPool)
+    try:
+        async with engine.connect() as killer:
+            await killer.execute(text(f"KILL QUERY {int(thread_id)}"))
+    finally:
+        await engine.dispose()
+
+
+def interrupt_connection(connection):
+    """Abort the statement running on a (sync) connection, from another thread or task.
+
+    MySQL drivers have no cancel call, so there the query is killed from a second connection:
+    the kill is returned as a coroutine for the caller to await. Otherwise returns None.
+    """
+    driver_connection = raw_driver_connection(connection)
+    if driver_connection is None:
+        return None
+    if connection.engine.dialect.name in ("mysql", "mariadb"):
+        thread_id = getattr(driver_connection, "thread_id", None)
+        if callable(thread_id):
+            return kill_query_async(connection.engine.url, thread_id())
+        return None
+    for method in ("interrupt", "cancel"):  # sqlite3, psycopg/psycopg2
+        if callable(getattr(driver_connection, method, None)):
+            getattr(driver_connection, method)()
+            return None
+    logger.warning("Database driver cannot cancel a running statement")
+    return None
+
+
+async def run_held(fn, continuation):
+    """Call fn(continuation) in a worker thread, like run_db for the connection of a held cursor:
+    if the caller is cancelled the statement is interrupted and, once fn has unwound with an
+    error, the cursor released"""
+    connection = continuation.cursor_result.connection
+    running = asyncio.ensure_future(asyncio.to_thread(fn, continuation))
+    try:
+        return await asyncio.shield(running)
+    except asyncio.CancelledError:
+        await await_kill(interrupt_connection(connection))
+        await asyncio.gather(running, return_exceptions=True)
+        if running.exception() is not None:
+            continuation.release()
+        raise
+
+
+async def await_kill(kill):
+    if kill is None:
+        return
+    try:
+        await kill
+    except Exception as e:
+        logger.warning(f"Could not kill the running query: {e}")
+
+
+async def run_db(fn, *args, connection_handoff=False, **kwargs):
+    """Call fn(connection, *args, **kwargs) with a database connection.
+
+    In async mode fn runs through AsyncConnection.run_sync, so its database I/O awaits on
+    the event loop instead of blocking it. Otherwise fn runs in a worker thread. Either way,
+    if the caller is cancelled (client disconnect, timeout) the running statement is
+    interrupted and the connection goes back to the pool once fn has unwound.
+
+    With connection_handoff (sync mode only) fn takes over the connection and closes it itself.
+    """
+    if not ASYNC_MODE:
+        lock = threading.Lock()
+        active = []
+
+        def call():
+            connection = get_connection()
+            with lock:
+                active.append(connection)
+            try:
+                return fn(connection, *args, **kwargs)
+            finally:
+                with lock:
+                    active.clear()
+                if not connection_handoff:
+                    connection.close()
+
+        try:
+            return await asyncio.to_thread(call)
+        except asyncio.CancelledError:
+            with lock:
+                kill = interrupt_connection(active[0]) if active else None
+            await await_kill(kill)
+            raise
+
+    conn = await get_async_connection()
+    try:
+        # Shielded: a cancellation thrown into run_sync would wait behind the running statement
+        running = asyncio.ensure_future(conn.run_sync(fn, *args, **kwargs))
+        try:
+            return await asyncio.shield(running)
+        except asyncio.CancelledError:
+            await await_kill(interrupt_connection(conn.sync_connection))
+            await asyncio.gather(running, return_exceptions=True)
+            raise
+    finally:
+        await conn.close()
+
+
+def describe_connection(conn):
+    engine = conn.engine
+    url = engine.url
+    result = [
+        f"Connected to {engine.dialect.name}",
+        f"version {'.'.join(str(x) for x in engine.dialect.server_version_info)}",
+        f"database {url.database}",
+    ]
+
+    if url.host:
+        result.append(f"on {url.host}")
+
+    if url.username:
+        result.append(f"as user {url.username}")
+
+    return " ".join(result) + "."
+
+
+async def run_on_private_engine(fn):
+    # A private engine: its connections belong to this temporary event loop, not the server's
+    engine = create_new_engine()
+    try:
+        async with engine.connect() as conn:
+            return await conn.run_sync(fn)
+    finally:
+        await engine.dispose()
+
+
+def run_db_blocking(fn):
+    """Call fn(connection) from a thread without a running event loop, in either mode"""
+    if ASYNC_MODE:
+        return asyncio.run(run_on_private_engine(fn))
+    with get_connection() as conn:
+        return fn(conn)
+
+
+def get_db_info():
+    return run_db_blocking(describe_connection)
+
+
+### Metrics ###
+
+# Tool calls and their phases are often well under a millisecond
+TOOL_LATENCY_BOUNDS_MS = (0.1, 0.5, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class CallMetrics:
+    """What one tool call spent and produced, collected through CURRENT_CALL while it runs.
+
+    Phase times of statements a call runs concurrently (execute_queries) add up.
+    """
+
+    def __init__(self):
+        self.phases = defaultdict(float)
+        self.rows_fetched = 0
+        self.rows_shown = 0
+        self.errors = []
+        self.shared = False
+        self._lock = threading.Lock()
+
+    def add_phase(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] += seconds
+
+    def add_rows(self, fetched, shown):
+        with self._lock:
+            self.rows_fetched += fetched
+            self.rows_shown += shown
+
+    def add_error(self, kind):
+        with self._lock:
+            self.errors.append(kind)
+
+
+# Copied into worker threads (asyncio.to_thread) and run_sync greenlets, so phases recorded there
+# reach the call that started them
+CURRENT_CALL = contextvars.ContextVar("current_call", default=None)
+
+
+@contextmanager
+def phase(name):
+    """Time the enclosed block as a phase of the current tool call, if any"""
+    call = CURRENT_CALL.get()
+    if call is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        call.add_phase(name, time.perf_counter() - started)
+
+
+def record_phase(name, seconds):
+    call = CURRENT_CALL.get()
+    if call is not None:
+        call.add_phase(name, seconds)
+
+
+def record_rows(fetched, shown):
+    call = CURRENT_CALL.get()
+    if call is not None:
+        call.add_rows(fetched, shown)
+
+
+def record_error(error):
+    """Note an exception a tool turns into an "Error: ..." output"""
+    call = CURRENT_CALL.get()
+    if call is not None:
+        call.add_error(type(error).__name__)
+
+
+class ToolStats:
+    def __init__(self):
+        self.calls = 0
+        self.in_flight = 0
+        self.shared = 0
+        self.errors = Counter()
+        self.rows_fetched = 0
+        self.rows_shown = 0
+        self.bytes_returned = 0
+        self.latency = Histogram(TOOL_LATENCY_BOUNDS_MS)
+        self.phases = defaultdict(lambda: Histogram(TOOL_LATENCY_BOUNDS_MS))
+
+
+class ToolMetrics:
+    """Per-tool call counts, errors by kind, rows, bytes and latency histograms (total and per
+    phase: connect, explain, reflect, execute, fetch, format)"""
+
+    def __init__(self):
+        self.tools = defaultdict(ToolStats)
+        self._lock = threading.Lock()
+
+    def start(self, tool):
+        with self._lock:
+            self.tools[tool].in_flight += 1
+
+    def finish(self, tool, call, seconds, output):
+        if isinstance(output, str):
+            if output.startswith("Error:") and not call.errors:
+                # Errors of a shared call were recorded by the caller that ran it
+                call.errors.append("shared" if call.shared else "refused")
+            size = len(output.encode("utf-8"))
+        else:
+            size = 0
+        with self._lock:
+            stats = self.tools[tool]
+            stats.in_flight -= 1
+            stats.calls += 1
+            stats.shared += call.shared
+            stats.errors.update(call.errors)
+            stats.rows_fetched += call.rows_fetched
+            stats.rows_shown += call.rows_shown
+            stats.bytes_returned += size
+            phase_histograms = [(stats.phases[name], t) for name, t in call.phases.items()]
+        stats.latency.observe(seconds)
+        for histogram, phase_seconds in phase_histograms:
+            histogram.observe(phase_seconds)
+
+    def items(self):
+        """Sorted (tool name, ToolStats) pairs"""
+        with self._lock:
+            return sorted(self.tools.items())
+
+    def snapshot(self):
+        result = {}
+        for name, stats in self.items():
+            result[name] = {
+                "calls": stats.calls,
+                "in_flight": stats.in_flight,
+                "shared": stats.shared,
+                "errors": dict(stats.errors),
+                "rows_fetched": stats.rows_fetched,
+                "rows_shown": stats.rows_shown,
+                "bytes_returned": stats.bytes_returned,
+                "latency": stats.latency.snapshot(),
+                "phases": {
+                    phase_name: histogram.snapshot()
+                    for phase_name, histogram in sorted(stats.phases.items())
+                },
+            }
+        return result
+
+
+TOOL_METRICS = ToolMetrics()
+
+
+def metered(fn):
+    """Record calls of a tool function in TOOL_METRICS, including exceptions it raises"""
+    if not METRICS_ENABLED:
+        return fn
+    name = fn.__name__
+
+    def finish(call, started, output):
+        TOOL_METRICS.finish(name, call, time.perf_counter() - started, output)
+
+    if asyncio.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            call, started, output = CallMetrics(), time.perf_counter(), None
+            token = CURRENT_CALL.set(call)
+            TOOL_METRICS.start(name)
+            try:
+                output = await fn(*args, **kwargs)
+                return output
+            except BaseException as e:
+                call.add_error(type(e).__name__)
+                raise
+            finally:
+                CURRENT_CALL.reset(token)
+                finish(call, started, output)
+
+    else:
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            call, started, output = CallMetrics(), time.perf_counter(), None
+            token = CURRENT_CALL.set(call)
+            TOOL_METRICS.start(name)
+            try:
+                output = fn(*args, **kwargs)
+                return output
+            except BaseException as e:
+                call.add_error(type(e).__name__)
+                raise
+            finally:
+                CURRENT_CALL.reset(token)
+                finish(call, started, output)
+
+    return wrapper
+
+
+def prometheus_labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def prometheus_family(lines, name, kind, help_text, samples):
+    """Append a metric family: samples are (labels dict, value)"""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{prometheus_labels(**labels)} {value}")
+
+
+def prometheus_histogram(lines, name, histogram, **labels):
+    buckets, count, total = histogram.cumulative()
+    for bound, cumulative in buckets:
+        lines.append(f"{name}_bucket{prometheus_labels(**labels, le=f'{bound:g}')} {cumulative}")
+    lines.append(f"{name}_bucket{prometheus_labels(**labels, le='+Inf')} {count}")
+    lines.append(f"{name}_sum{prometheus_labels(**labels)} {total:.6f}")
+    lines.append(f"{name}_count{prometheus_labels(**labels)} {count}")
+
+
+# Per-tool counters: metric name -> (ToolStats attribute, Prometheus type, help)
+TOOL_COUNTERS = {
+    "mcp_alchemy_tool_calls_total": ("calls", "counter", "Completed tool calls."),
+    "mcp_alchemy_tool_in_flight": ("in_flight", "gauge", "Tool calls running now."),
+    "mcp_alchemy_tool_shared_calls_total": (
+        "shared",
+        "counter",
+        "Tool calls answered by an identical call already in flight.",
+    ),
+    "mcp_alchemy_tool_rows_fetched_total": (
+        "rows_fetched",
+        "counter",
+        "Rows read from the database.",
+    ),
+    "mcp_alchemy_tool_rows_shown_total": ("rows_shown", "counter", "Rows included in output."),
+    "mcp_alchemy_tool_response_bytes_total": (
+        "bytes_returned",
+        "counter",
+        "UTF-8 bytes of tool output.",
+    ),
+}
+
+
+def prometheus_metrics():
+    """TOOL_METRICS and POOL_STATS in the Prometheus text exposition format"""
+    tools = TOOL_METRICS.items()
+    lines = []
+    for name, (attribute, kind, help_text) in TOOL_COUNTERS.items():
+        samples = [({"tool": tool}, getattr(stats, attribute)) for tool, stats in tools]
+        prometheus_family(lines, name, kind, help_text, samples)
+    prometheus_family(
+        lines,
+        "mcp_alchemy_tool_errors_total",
+        "counter",
+        "Tool errors by kind: exception class, refused (invalid request) or shared.",
+        [
+            ({"tool": tool, "kind": kind}, count)
+            for tool, stats in tools
+            for kind, count in sorted(stats.errors.items())
+        ],
+    )
+
+    prometheus_family(
+        lines, "mcp_alchemy_tool_duration_seconds", "histogram", "Tool call latency.", []
+    )
+    for tool, stats in tools:
+        prometheus_histogram(lines, "mcp_alchemy_tool_duration_seconds", stats.latency, tool=tool)
+    prometheus_family(
+        lines,
+        "mcp_alchemy_tool_phase_duration_seconds",
+        "histogram",
+        "Time a tool call spent in a phase.",
+        [],
+    )
+    for tool, stats in tools:
+        for phase_name, histogram in sorted(stats.phases.items()):
+            prometheus_histogram(
+                lines,
+                "mcp_alchemy_tool_phase_duration_seconds",
+                histogram,
+                tool=tool,
+                phase=phase_name,
+            )
+
+    pool = POOL_STATS.snapshot(ENGINE)
+    prometheus_family(
+        lines,
+        "mcp_alchemy_pool_checkouts_total",
+        "counter",
+        "Connection pool checkouts.",
+        [({}, pool["checkouts"])],
+    )
+    prometheus_family(
+        lines,
+        "mcp_alchemy_pool_timeouts_total",
+        "counter",
+        "Pool checkouts that timed out.",
+        [({}, pool["timeouts"])],
+    )
+    if "checkedout" in pool:
+        prometheus_family(
+            lines,
+            "mcp_alchemy_pool_checked_out",
+            "gauge",
+            "Connections checked out now.",
+            [({}, pool["checkedout"])],
+        )
+    prometheus_family(
+        lines,
+        "mcp_alchemy_pool_checkout_duration_seconds",
+        "histogram",
+        "Pool checkout latency.",
+        [],
+    )
+    prometheus_histogram(
+        lines, "mcp_alchemy_pool_checkout_duration_seconds", POOL_STATS.checkout_latency
+    )
+    return "\n".join(lines) + "\n"
+
+
+### Constants ###
+
+VERSION = "1.0.0"
+ASYNC_MODE = is_async_url(os.environ.get("DB_URL"))
+# Defer engine creation and DB_INFO to a background warm-up so startup never waits on the database
+LAZY_INIT = os.environ.get("LAZY_INIT", "false").lower() == "true"
+DB_INFO = None
+if not LAZY_INIT:
+    _started = time.perf_counter()
+    DB_INFO = get_db_info()
+    record_startup_phase("db_info", _started)
+EXECUTE_QUERY_MAX_CHARS = int(os.environ.get("EXECUTE_QUERY_MAX_CHARS", 4000))
+# "chars" budgets output by characters, "tokens" by estimated LLM tokens
+OUTPUT_BUDGET_MODE = os.environ.get("OUTPUT_BUDGET_MODE", "chars").lower()
+EXECUTE_QUERY_MAX_TOKENS = int(os.environ.get("EXECUTE_QUERY_MAX_TOKENS", 1000))
+# schema_definitions output budgets, 0 means unlimited
+SCHEMA_DEFINITIONS_MAX_CHARS = int(os.environ.get("SCHEMA_DEFINITIONS_MAX_CHARS", 0))
+SCHEMA_DEFINITIONS_MAX_TOKENS = int(os.environ.get("SCHEMA_DEFINITIONS_MAX_TOKENS", 0))
+READ_ONLY_MODE = os.environ.get("READ_ONLY_MODE", "true").lower() == "true"
+# Default execute_query output format, see OUTPUT_FORMATS
+EXECUTE_QUERY_FORMAT = os.environ.get("EXECUTE_QUERY_FORMAT", "vertical").lower()
+# Longer text cells are cut with a length marker (0 disables)
+EXECUTE_QUERY_MAX_CELL_CHARS = int(os.environ.get("EXECUTE_QUERY_MAX_CELL_CHARS", 500))
+# Cut long text/binary cells in the database (one extra probe query) so they are never fetched whole
+EXECUTE_QUERY_CELL_PROJECTION = (
+    os.environ.get("EXECUTE_QUERY_CELL_PROJECTION", "false").lower() == "true"
+)
+# Seconds a statement may run (0 disables); execute_query can override it per call
+EXECUTE_QUERY_TIMEOUT = float(os.environ.get("EXECUTE_QUERY_TIMEOUT", 0))
+# Most queries one execute_queries call accepts, and how many of them run at the same time (capped
+# at the free connections of the pool, so POOL_MODE=adaptive is needed for more than a few)
+EXECUTE_QUERIES_MAX_QUERIES = int(os.environ.get("EXECUTE_QUERIES_MAX_QUERIES", 20))
+EXECUTE_QUERIES_CONCURRENCY = int(os.environ.get("EXECUTE_QUERIES_CONCURRENCY", 4))
+EXECUTE_QUERY_FETCH_SIZE = int(os.environ.get("EXECUTE_QUERY_FETCH_SIZE", 100))
+# Rewrite read-only SELECTs to request no more rows than the output budget can show
+EXECUTE_QUERY_AUTO_LIMIT = (
+    os.environ.get("EXECUTE_QUERY_AUTO_LIMIT", "false").lower() == "true"
+)
+# Check SELECT plans for full scans of large tables before running them: off, warn or reject
+QUERY_COST_GUARD = os.environ.get("QUERY_COST_GUARD", "off").lower()
+FULL_SCAN_ROW_THRESHOLD = int(os.environ.get("FULL_SCAN_ROW_THRESHOLD", 100000))
+SCHEMA_CACHE_TTL = float(os.environ.get("SCHEMA_CACHE_TTL", 300))
+SCHEMA_CACHE_MAX_TABLES = int(os.environ.get("SCHEMA_CACHE_MAX_TABLES", 2000))
+# Scalar query whose result changes whenever DDL is applied (non-SQLite dialects),
+# e.g. "SELECT version_num FROM alembic_version"
+SCHEMA_FINGERPRINT_QUERY = os.environ.get("SCHEMA_FINGERPRINT_QUERY")
+# File holding the reflected schema between runs (e.g. on a volume shared by replicas); empty to disable
+SCHEMA_SNAPSHOT_PATH = os.environ.get("SCHEMA_SNAPSHOT_PATH", "")
+# Seconds table_stats serves cached estimates before refreshing them in the background
+TABLE_STATS_TTL = float(os.environ.get("TABLE_STATS_TTL", 300))
+# Name suffixes of tables that mirror a base table's columns (audit copies and the like), which
+# all_table_names and schema_definitions fold into their base table; empty to disable
+SCHEMA_FAMILY_SUFFIXES = [
+    suffix.strip()
+    for suffix in os.environ.get("SCHEMA_FAMILY_SUFFIXES", "_trace,_log,_view").split(",")
+    if suffix.strip()
+]
+FILTER_TABLE_NAMES_LIMIT = int(os.environ.get("FILTER_TABLE_NAMES_LIMIT", 100))
+# Minimum trigram similarity (0-1) for a fuzzy filter_table_names match
+FUZZY_MATCH_THRESHOLD = float(os.environ.get("FUZZY_MATCH_THRESHOLD", 0.3))
+# Truncated execute_query results hand out continuation tokens for fetch_more
+PAGINATION_IDLE_TIMEOUT = float(os.environ.get("PAGINATION_IDLE_TIMEOUT", 60))
+PAGINATION_MAX_TOKENS = int(os.environ.get("PAGINATION_MAX_TOKENS", 100))
+# Open cursors kept for fetch_more; each holds a pooled connection until exhausted or idle
+# (never on SQLite databases outside WAL mode, where they would block other writers)
+PAGINATION_MAX_HELD_CURSORS = int(os.environ.get("PAGINATION_MAX_HELD_CURSORS", 1))
+# Let concurrent identical read-only calls share one execution
+SINGLE_FLIGHT_ENABLED = os.environ.get("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+# Per-tool call metrics, served in Prometheus text format at METRICS_PATH of the HTTP server
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PATH = os.environ.get("METRICS_PATH", "/metrics")
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE_ENABLED", "false").lower() == "true"
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", 30))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 256))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+### Schema Catalog ###
+
+
+class SchemaCache:
+    """Process-wide LRU cache of reflected table metadata with TTL expiry.
+
+    Entries are keyed by (engine url, table name). Each engine url also tracks the
+    last seen schema fingerprint; when it changes every entry for that url is dropped.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, table_name):
+        key = (url, table_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, url, table_name, value):
+        key = (url, table_name)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url=None, table_names=None):
+        """Drop cached entries, optionally limited to one url and/or some tables. Returns count dropped."""
+        with self._lock:
+            keys = [
+                key
+                for key in self._entries
+                if (url is None or key[0] == url)
+                and (table_names is None or key[1] in table_names)
+            ]
+            for key in keys:
+                del self._entries[key]
+            if table_names is None:
+                if url is None:
+                    self._fingerprints.clear()
+                else:
+                    self._fingerprints.pop(url, None)
+            return len(keys)
+
+    def check_fingerprint(self, url, fingerprint):
+        """Record the current schema fingerprint, invalidating the url's entries if it changed"""
+        if fingerprint is None:
+            return
+        with self._lock:
+            previous = self._fingerprints.get(url)
+            self._fingerprints[url] = fingerprint
+        if previous is not None and previous != fingerprint:
+            logger.info(f"Schema fingerprint changed for {url}, invalidating schema cache")
+            self.invalidate(url)
+            with self._lock:
+                self._fingerprints[url] = fingerprint
+
+    def __len__(self):
+        return len(self._entries)
+
+
+SCHEMA_CACHE = SchemaCache(SCHEMA_CACHE_TTL, SCHEMA_CACHE_MAX_TABLES)
+
+
+def engine_key(conn):
+    """Stable identity for the database behind a connection (password is masked)"""
+    return str(conn.engine.url)
+
+
+def schema_fingerprint(conn):
+    """Return a value that changes whenever the schema changes, or None if unknown"""
+    try:
+        if conn.engine.dialect.name == "sqlite":
+            return conn.execute(text("PRAGMA schema_version")).scalar()
+        if SCHEMA_FINGERPRINT_QUERY:
+            return conn.execute(text(SCHEMA_FINGERPRINT_QUERY)).scalar()
+    except Exception as e:
+        logger.warning(f"Could not read schema fingerprint: {e}")
+    return None
+
+
+def reflect_table(inspector, table_name, columns=None):
+    """Reflect the parts of a table that schema_definitions displays"""
+    return {
+        "columns": columns if columns is not None else inspector.get_columns(table_name),
+        "foreign_keys": inspector.get_foreign_keys(table_name),
+        "primary_keys": inspector.get_pk_constraint(table_name)["constrained_columns"],
+    }
+
+
+def reflect_tables(inspector, table_names, columns=None):
+    """Reflect many tables with the Inspector get_multi_* API (a few catalog queries on
+    dialects with bulk support such as PostgreSQL), falling back to per-table reflection.
+
+    columns maps table names to columns reflected already, which are not reflected again.
+    """
+    known = columns or {}
+    result = {}
+    if len(table_names) > 1:
+        options = {"filter_names": list(table_names), "kind": ObjectKind.ANY}
+        unknown = [table_name for table_name in table_names if table_name not in known]
+        try:
+            reflected = {}
+            if unknown:
+                reflected = inspector.get_multi_columns(**{**options, "filter_names": unknown})
+            foreign_keys = inspector.get_multi_foreign_keys(**options)
+            pk_constraints = inspector.get_multi_pk_constraint(**options)
+        except NotImplementedError:
+            logger.info("Bulk reflection not supported by dialect, reflecting per table")
+        else:
+            table_columns = {key[1]: value for key, value in reflected.items()}
+            table_columns.update(known)
+            foreign_keys = {key[1]: value for key, value in foreign_keys.items()}
+            pk_constraints = {key[1]: value for key, value in pk_constraints.items()}
+            for table_name, value in table_columns.items():
+                result[table_name] = {
+                    "columns": value,
+                    "foreign_keys": foreign_keys.get(table_name, []),
+                    "primary_keys": pk_constraints.get(table_name, {}).get(
+                        "constrained_columns", []
+                    ),
+                }
+
+    # Anything the bulk path did not return (or could not) goes through the per-table path,
+    # which also raises NoSuchTableError for unknown tables as before
+    for table_name in table_names:
+        if table_name not in result:
+            result[table_name] = reflect_table(inspector, table_name, known.get(table_name))
+    return result
+
+
+def get_table_schemas(conn, table_names):
+    """Return {table_name: reflected info}, served from SCHEMA_CACHE where possible.
+
+    Entries holding only columns (cached by build_schema_families) are completed.
+    """
+    url = engine_key(conn)
+    SCHEMA_CACHE.check_fingerprint(url, schema_fingerprint(conn))
+
+    schemas = {}
+    missing = []
+    partial = {}
+    for table_name in table_names:
+        info = SCHEMA_CACHE.get(url, table_name)
+        if info is None or "foreign_keys" not in info:
+            missing.append(table_name)
+            if info is not None:
+                partial[table_name] = info["columns"]
+        else:
+            schemas[table_name] = info
+
+    if missing:
+        with phase("reflect"):
+            reflected = reflect_tables(inspect(conn), list(dict.fromkeys(missing)), partial)
+        for table_name, info in reflected.items():
+            SCHEMA_CACHE.put(url, table_name, info)
+        schemas.update(reflected)
+    return schemas
+
+
+def catalog_fresh(fingerprint, cached_fingerprint, built_at):
+    """Whether a structure built from the schema is still valid, by fingerprint or else by age"""
+    if fingerprint is not None:
+        return cached_fingerprint == fingerprint
+    return time.monotonic() - built_at <= SCHEMA_CACHE_TTL
+
+
+class CatalogCache:
+    """A structure built from the whole schema, kept per database until the schema changes"""
+
+    def __init__(self, build):
+        self.build = build
+        self.entries = {}  # url -> (fingerprint, built_at, value)
+        self.lock = threading.Lock()
+
+    def get(self, conn):
+        url = engine_key(conn)
+        fingerprint = schema_fingerprint(conn)
+        SCHEMA_CACHE.check_fingerprint(url, fingerprint)
+
+        with self.lock:
+            cached = self.entries.get(url)
+        if cached is not None and catalog_fresh(fingerprint, cached[0], cached[1]):
+            return cached[2]
+
+        value = self.build(conn)
+        self.put(url, fingerprint, value)
+        return value
+
+    def put(self, url, fingerprint, value):
+        with self.lock:
+            self.entries[url] = (fingerprint, time.monotonic(), value)
+
+    def invalidate(self, url):
+        with self.lock:
+            self.entries.pop(url, None)
+
+
+def type_name(column_type, dialect=None):
+    """Name of a reflected type; compiling it with the database's dialect avoids building a
+    default dialect per call, which dominates comparing thousands of columns"""
+    if dialect is not None:
+        try:
+            return column_type.compile(dialect=dialect)
+        except Exception:
+            pass
+    return str(column_type)
+
+
+def schema_families(columns, dialect=None):
+    """Map every table named <base><suffix> that has all of the base table's columns (same names
+    and types, plus its own) to (base, suffix), for the suffixes in SCHEMA_FAMILY_SUFFIXES.
+
+    columns maps table names to their reflected columns.
+    """
+    signatures = {
+        table_name: {column["name"]: type_name(column["type"], dialect) for column in table_columns}
+        for table_name, table_columns in columns.items()
+    }
+    families = {}
+    for table_name, signature in signatures.items():
+        for suffix in SCHEMA_FAMILY_SUFFIXES:
+            base = table_name[: -len(suffix)] if table_name.endswith(suffix) else None
+            if base in signatures and signature.items() >= signatures[base].items():
+                families[table_name] = (base, suffix)
+                break
+    return families
+
+
+def family_candidates(table_names):
+    """The tables that may form a family: those named <base><suffix> with an existing base, and
+    their bases"""
+    existing = set(table_names)
+    candidates = set()
+    for table_name in table_names:
+        for suffix in SCHEMA_FAMILY_SUFFIXES:
+            if table_name.endswith(suffix) and table_name[: -len(suffix)] in existing:
+                candidates.update((table_name, table_name[: -len(suffix)]))
+    return sorted(candidates)
+
+
+def build_schema_families(conn):
+    if not SCHEMA_FAMILY_SUFFIXES:
+        return {}
+    inspector = inspect(conn)
+    url = engine_key(conn)
+    columns, unknown = {}, []
+    for table_name in family_candidates(inspector.get_table_names()):
+        info = SCHEMA_CACHE.get(url, table_name)
+        if info is None:
+            unknown.append(table_name)
+        else:
+            columns[table_name] = info["columns"]
+    if unknown:
+        with phase("reflect"):
+            reflected = inspector.get_multi_columns(filter_names=unknown)
+        # Cached as columns-only entries, which get_table_schemas completes instead of
+        # reflecting the columns again
+        for (_, table_name), value in reflected.items():
+            SCHEMA_CACHE.put(url, table_name, {"columns": value})
+            columns[table_name] = value
+    return schema_families(columns, conn.dialect)
+
+
+SCHEMA_FAMILIES = CatalogCache(build_schema_families)
+
+
+### Name Index ###
+
+
+def trigrams(name):
+    padded = f"  {name} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """In-memory search index over table, view and column names.
+
+    Matches are ranked exact > prefix > token (split on "_" and ".") > substring > fuzzy,
+    where fuzzy matches are found through a trigram inverted index.
+    """
+
+    def __init__(self, entries):
+        # entries: list of (name, kind) with kind one of "table", "view", "column"
+        self.entries = entries
+        self.lowered = [name.lower() for name, _ in entries]
+        self.tokens = [set(re.split(r"[_.]", name)) for name in self.lowered]
+        self.by_kind = defaultdict(list)
+        self.trigram_counts = []
+        self.postings = defaultdict(list)
+        for i, name in enumerate(self.lowered):
+            self.by_kind[entries[i][1]].append(i)
+            grams = trigrams(name)
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                self.postings[gram].append(i)
+
+    def names(self, kind):
+        return [self.entries[i][0] for i in self.by_kind[kind]]
+
+    def search(self, q, limit, kinds=("table",)):
+        q = q.lower().strip()
+        if not q:
+            return []
+        q_tokens = set(re.split(r"[_.]", q))
+        ranked = []
+        matched = set()
+        candidates = sorted(i for kind in kinds for i in self.by_kind[kind])
+        for i in candidates:
+            name = self.lowered[i]
+            if name == q:
+                rank = 0
+            elif name.startswith(q):
+                rank = 1
+            elif q_tokens <= self.tokens[i]:
+                rank = 2
+            elif q in name:
+                rank = 3
+            else:
+                continue
+            ranked.append((rank, len(name), name, i))
+            matched.add(i)
+
+        if len(ranked) < limit:
+            q_grams = trigrams(q)
+            shared = Counter(
+                i for gram in q_grams for i in self.postings.get(gram, ())
+            )
+            for i, common in shared.items():
+                if i in matched or self.entries[i][1] not in kinds:
+                    continue
+                similarity = common / (len(q_grams) + self.trigram_counts[i] - common)
+                if similarity >= FUZZY_MATCH_THRESHOLD:
+                    ranked.append((4, -similarity, self.lowered[i], i))
+
+        ranked.sort()
+        return [self.entries[i][0] for *_, i in ranked[:limit]]
+
+
+# engine url -> (fingerprint, built_at, includes_columns, NameIndex)
+NAME_INDEXES = {}
+NAME_INDEXES_LOCK = threading.Lock()
+
+
+def name_index(table_names, view_names, columns=None):
+    """Build a NameIndex; columns maps table (and view) names to their reflected columns"""
+    entries = [(name, "table") for name in table_names]
+    entries += [(name, "view") for name in view_names]
+    for table_name, table_columns in (columns or {}).items():
+        entries += [(f"{table_name}.{column['name']}", "column") for column in table_columns]
+    return NameIndex(entries)
+
+
+def build_name_index(conn, include_columns):
+    inspector = inspect(conn)
+    columns = None
+    if include_columns:
+        columns = {
+            table_name: value
+            for (_, table_name), value in inspector.get_multi_columns(kind=ObjectKind.ANY).items()
+        }
+    return name_index(inspector.get_table_names(), inspector.get_view_names(), columns)
+
+
+def get_name_index(conn, include_columns=False):
+    """Return the NameIndex for the connection's database, rebuilding it when the schema changed"""
+    url = engine_key(conn)
+    fingerprint = schema_fingerprint(conn)
+    SCHEMA_CACHE.check_fingerprint(url, fingerprint)
+
+    with NAME_INDEXES_LOCK:
+        cached = NAME_INDEXES.get(url)
+    if cached is not None:
+        cached_fingerprint, built_at, includes_columns, index = cached
+        fresh = catalog_fresh(fingerprint, cached_fingerprint, built_at)
+        if fresh and (includes_columns or not include_columns):
+            return index
+
+    index = build_name_index(conn, include_columns)
+    with NAME_INDEXES_LOCK:
+        NAME_INDEXES[url] = (fingerprint, time.monotonic(), include_columns, index)
+    return index
+
+
+### Foreign Key Graph ###
+
+
+ForeignKey = namedtuple("ForeignKey", ["table", "columns", "referred_table", "referred_columns"])
+
+
+class ForeignKeyGraph:
+    """The foreign keys of all tables, indexed in both directions"""
+
+    def __init__(self, tables, foreign_keys, quote):
+        self.tables = set(tables)
+        self.quote = quote
+        self.outgoing = defaultdict(list)
+        self.incoming = defaultdict(list)
+        for fk in foreign_keys:
+            self.outgoing[fk.table].append(fk)
+            self.incoming[fk.referred_table].append(fk)
+
+    def describe(self, fk):
+        columns = ", ".join(fk.columns)
+        referred_columns = ", ".join(fk.referred_columns)
+        return f"{fk.table}({columns}) -> {fk.referred_table}({referred_columns})"
+
+    def join_condition(self, fk):
+        table, referred_table = self.quote(fk.table), self.quote(fk.referred_table)
+        return " AND ".join(
+            f"{table}.{self.quote(column)} = {referred_table}.{self.quote(referred_column)}"
+            for column, referred_column in zip(fk.columns, fk.referred_columns)
+        )
+
+    def join_path(self, from_table, to_table, exclude=()):
+        """Shortest chain of foreign keys joining two tables as [(joined table, fk), ...], or None"""
+        previous = {from_table: None}
+        queue = deque([from_table])
+        while queue and to_table not in previous:
+            table = queue.popleft()
+            for fk in chain(self.outgoing[table], self.incoming[table]):
+                other = fk.referred_table if fk.table == table else fk.table
+                if other not in previous and other not in exclude:
+                    previous[other] = (table, fk)
+                    queue.append(other)
+
+        if to_table not in previous:
+            return None
+        path = []
+        table = to_table
+        while previous[table] is not None:
+            parent, fk = previous[table]
+            path.append((table, fk))
+            table = parent
+        return path[::-1]
+
+
+def fk_graph(foreign_keys, quote):
+    """Build a ForeignKeyGraph; foreign_keys maps every table name to its reflected foreign keys"""
+    return ForeignKeyGraph(
+        foreign_keys,
+        [
+            ForeignKey(
+                table,
+                tuple(fk["constrained_columns"]),
+                fk["referred_table"],
+                tuple(fk["referred_columns"]),
+            )
+            for table, table_fks in foreign_keys.items()
+            for fk in table_fks
+        ],
+        quote,
+    )
+
+
+def build_fk_graph(conn):
+    foreign_keys = inspect(conn).get_multi_foreign_keys()
+    return fk_graph(
+        {table: value for (_, table), value in foreign_keys.items()},
+        conn.dialect.identifier_preparer.quote,
+    )
+
+
+FK_GRAPHS = CatalogCache(build_fk_graph)
+
+
+### Schema Snapshot ###
+
+
+SCHEMA_SNAPSHOT_VERSION = 1
+SCHEMA_SNAPSHOT_FINGERPRINT = None  # fingerprint of the snapshot loaded or written last
+
+
+def reflect_catalog(conn):
+    """Reflect every table and view, everything a schema snapshot holds"""
+    inspector = inspect(conn)
+    table_names = inspector.get_table_names()
+    view_names = inspector.get_view_names()
+    return {
+        "tables": table_names,
+        "views": view_names,
+        "schemas": reflect_tables(inspector, table_names + view_names),
+    }
+
+
+def seed_schema_caches(url, fingerprint, catalog, quote):
+    """Fill the schema cache, name index, FK graph and families of a database from its catalog"""
+    schemas = catalog["schemas"]
+    SCHEMA_CACHE.check_fingerprint(url, fingerprint)
+    for table_name, info in schemas.items():
+        SCHEMA_CACHE.put(url, table_name, info)
+
+    # Column names are left to the first include_columns search, indexing them dominates loading
+    index = name_index(catalog["tables"], catalog["views"])
+    with NAME_INDEXES_LOCK:
+        NAME_INDEXES[url] = (fingerprint, time.monotonic(), False, index)
+
+    table_schemas = {table_name: schemas[table_name] for table_name in catalog["tables"]}
+    FK_GRAPHS.put(
+        url,
+        fingerprint,
+        fk_graph({name: info["foreign_keys"] for name, info in table_schemas.items()}, quote),
+    )
+    families = {}
+    if SCHEMA_FAMILY_SUFFIXES:
+        families = schema_families({name: info["columns"] for name, info in table_schemas.items()})
+    SCHEMA_FAMILIES.put(url, fingerprint, families)
+
+
+def load_schema_snapshot():
+    """Seed the schema caches from SCHEMA_SNAPSHOT_PATH without touching the database.
+
+    The snapshot is trusted until the first schema lookup reads the database's fingerprint.
+    """
+    global SCHEMA_SNAPSHOT_FINGERPRINT
+
+    try:
+        with gzip.open(SCHEMA_SNAPSHOT_PATH, "rt", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable schema snapshot {SCHEMA_SNAPSHOT_PATH}: {e}")
+        return
+    url = database_identity()
+    if snapshot.get("version") != SCHEMA_SNAPSHOT_VERSION or snapshot.get("url") != url:
+        logger.info(f"Schema snapshot {SCHEMA_SNAPSHOT_PATH} is for another database, ignoring it")
+        return
+
+    # Quoting needs only the dialect, not an engine or connection
+    dialect = make_url(os.environ["DB_URL"]).get_dialect()()
+    seed_schema_caches(
+        url, snapshot["fingerprint"], snapshot["catalog"], dialect.identifier_preparer.quote
+    )
+    SCHEMA_SNAPSHOT_FINGERPRINT = snapshot["fingerprint"]
+    logger.info(f"Loaded schema snapshot with {len(snapshot['catalog']['schemas'])} tables")
+
+
+def write_schema_snapshot(url, fingerprint, catalog):
+    snapshot = {
+        "version": SCHEMA_SNAPSHOT_VERSION,
+        "url": url,
+        "fingerprint": fingerprint,
+        "catalog": catalog,
+    }
+    # Written aside and renamed so concurrent replicas never read a partial file
+    partial = f"{SCHEMA_SNAPSHOT_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with gzip.open(partial, "wt", encoding="utf-8") as f:
+        # Column types are written as their SQL names, which is all the schema tools display
+        json.dump(snapshot, f, default=str, separators=(",", ":"))
+    os.replace(partial, SCHEMA_SNAPSHOT_PATH)
+
+
+def refresh_schema_snapshot(conn):
+    """Revalidate the snapshot against the database's schema fingerprint, reflecting everything
+    and rewriting it when the schema changed (or there was no snapshot)"""
+    global SCHEMA_SNAPSHOT_FINGERPRINT
+
+    fingerprint = schema_fingerprint(conn)
+    if fingerprint is None:
+        logger.warning(
+            "No schema fingerprint for this database (see SCHEMA_FINGERPRINT_QUERY), "
+            "schema snapshots are disabled"
+        )
+        return
+    if fingerprint == SCHEMA_SNAPSHOT_FINGERPRINT:
+        return
+
+    url = engine_key(conn)
+    catalog = reflect_catalog(conn)
+    seed_schema_caches(url, fingerprint, catalog, conn.dialect.identifier_preparer.quote)
+    write_schema_snapshot(url, fingerprint, catalog)
+    SCHEMA_SNAPSHOT_FINGERPRINT = fingerprint
+    logger.info(f"Wrote schema snapshot with {len(catalog['schemas'])} tables")
+
+
+### Table Stats ###
+
+
+TableStat = namedtuple("TableStat", ["rows", "bytes"])
+
+
+def sqlite_table_stats(conn):
+    tables = [
+        name
+        for (name,) in conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+        )
+    ]
+
+    # sqlite_stat1 (written by ANALYZE) starts every stat with the table's row count
+    rows = {}
+    try:
+        for table, stat in conn.execute(text("SELECT tbl, stat FROM sqlite_stat1")):
+            rows[table] = max(rows.get(table, 0), int(stat.split()[0]))
+    except Exception:
+        pass  # never analyzed
+    for table in tables:
+        if table not in rows:
+            rows[table] = approximate_row_count(conn, table)
+
+    # dbstat sizes are per b-tree; indexes are added to the table they belong to
+    sizes = defaultdict(int)
+    try:
+        owners = dict(conn.execute(text("SELECT name, tbl_name FROM sqlite_master")).all())
+        for name, size in conn.execute(text("SELECT name, pgsize FROM dbstat WHERE aggregate = 1")):
+            sizes[owners.get(name, name)] += size
+    except Exception as e:
+        logger.debug(f"dbstat is unavailable, table sizes are unknown: {e}")
+        sizes = {}
+
+    return {table: TableStat(rows[table], sizes.get(table)) for table in tables}
+
+
+def collect_table_stats(conn):
+    """Estimated row count and size in bytes (table plus indexes) per table, from catalog statistics"""
+    dialect_name = conn.engine.dialect.name
+    if dialect_name == "sqlite":
+        return sqlite_table_stats(conn)
+    if dialect_name == "postgresql":
+        result = conn.execute(
+            text(
+                "SELECT c.relname, c.reltuples, pg_total_relation_size(c.oid) FROM pg_class c "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE c.relkind IN ('r', 'p') AND n.nspname = current_schema()"
+            )
+        )
+        # Never analyzed tables report -1 reltuples
+        return {
+            name: TableStat(int(rows) if rows >= 0 else None, size)
+            for name, rows, size in result
+        }
+    if dialect_name in ("mysql", "mariadb"):
+        result = conn.execute(
+            text(
+                "SELECT TABLE_NAME, TABLE_ROWS, DATA_LENGTH + INDEX_LENGTH "
+                "FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'"
+            )
+        )
+        return {name: TableStat(rows, size) for name, rows, size in result}
+    return {name: TableStat(None, None) for name in inspect(conn).get_table_names()}
+
+
+def exact_row_counts(conn, table_names):
+    counts = {}
+    for table in table_names:
+        quoted = conn.dialect.identifier_preparer.quote(table)
+        try:
+            counts[table] = conn.execute(text(f"SELECT COUNT(*) FROM {quoted}")).scalar()
+        except Exception as e:
+            counts[table] = e
+    return counts
+
+
+class TableStatsCache:
+    """Table stats per database, served stale while a background task refreshes them"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.entries = {}  # database -> (stats, collected_at)
+        self.refreshing = {}  # database -> asyncio.Task
+        self.lock = threading.Lock()
+
+    def get(self, database):
+        """Return (stats, age in seconds) or None"""
+        with self.lock:
+            entry = self.entries.get(database)
+        if entry is None:
+            return None
+        stats, collected_at = entry
+        return stats, time.monotonic() - collected_at
+
+    async def collect(self, database):
+        stats = await run_db(collect_table_stats)
+        with self.lock:
+            self.entries[database] = (stats, time.monotonic())
+        return stats
+
+    def refresh(self, database):
+        """Return the task collecting fresh stats, starting one unless a refresh is in progress"""
+        with self.lock:
+            task = self.refreshing.get(database)
+            if task is None:
+                task = asyncio.ensure_future(self.collect(database))
+                task.add_done_callback(lambda task: self.refresh_done(database, task))
+                self.refreshing[database] = task
+        return task
+
+    def refresh_done(self, database, task):
+        with self.lock:
+            self.refreshing.pop(database, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Table stats refresh failed: {task.exception()}")
+
+
+TABLE_STATS = TableStatsCache(TABLE_STATS_TTL)
+
+
+### Result Cache ###
+
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][\w$]*")
+WRITE_TARGET_RE = re.compile(
+    r"\b(?:INTO|UPDATE|TABLE|FROM|TRUNCATE)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?([\w$.\"`\[\]]+)",
+    re.IGNORECASE,
+)
+
+
+def normalize_sql(query):
+    """Collapse whitespace and drop trailing semicolons so trivially different spellings share a key"""
+    return " ".join(query.split()).rstrip(";").rstrip()
+
+
+def query_identifiers(query):
+    """Every identifier-like word in the query, lowercased (a superset of the tables it reads)"""
+    return {word.lower() for word in IDENTIFIER_RE.findall(query)}
+
+
+def write_targets(query):
+    """Tables a write statement modifies, lowercased and without schema or quoting"""
+    return {
+        name.split(".")[-1].strip('"`[]').lower()
+        for name in WRITE_TARGET_RE.findall(query)
+    }
+
+
+def database_identity():
+    """Identity of the configured database that does not require a connection"""
+    return str(make_url(os.environ["DB_URL"]))
+
+
+class ResultCache:
+    """LRU cache of formatted execute_query output with TTL expiry and a total size cap in bytes"""
+
+    def __init__(self, ttl, max_entries, max_bytes):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(database, query, params, *options):
+        return (
+            database,
+            normalize_sql(query),
+            json.dumps(params, sort_keys=True, default=str),
+            options,
+        )
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value, _, _ = entry
+            if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, identifiers):
+        size = len(value.encode())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic(), value, identifiers, size)
+            self.size_bytes += size
+            while (
+                len(self._entries) > self.max_entries
+                or self.size_bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, database, tables=None):
+        """Drop entries for the database whose queries mention any of the tables (all if tables is empty)"""
+        with self._lock:
+            keys = [
+                key
+                for key, (_, _, identifiers, _) in self._entries.items()
+                if key[0] == database and (not tables or identifiers & tables)
+            ]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def _remove(self, key):
+        self.size_bytes -= self._entries.pop(key)[3]
+
+
+RESULT_CACHE = ResultCache(
+    RESULT_CACHE_TTL, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES
+)
+
+
+### Pagination ###
+
+
+class Continuation:
+    """State needed to resume a truncated result.
+
+    A held continuation keeps the open cursor (and its connection) with the rows already read
+    from it but not shown, starting with the first row that did not fit; otherwise fetch_more
+    re-executes the query skipping the rows already shown.
+    """
+
+    def __init__(
+        self,
+        query,
+        params,
+        rows_shown,
+        output_format,
+        cursor_result=None,
+        pending_rows=(),
+        columns=None,
+        timeout=0,
+    ):
+        self.query = query
+        self.params = params
+        self.rows_shown = rows_shown
+        self.output_format = output_format
+        self.cursor_result = cursor_result
+        self.pending_rows = list(pending_rows)
+        # Column names of the first page, which re-executed pages must show as well
+        self.columns = columns
+        # Statement timeout of the query, which bounds fetching further pages too
+        self.timeout = timeout
+        self.last_used = time.monotonic()
+
+    @property
+    def held(self):
+        return self.cursor_result is not None
+
+    def release(self):
+        """Close the held cursor and return its connection to the pool"""
+        if self.cursor_result is None:
+            return
+        connection = self.cursor_result.connection
+        try:
+            self.cursor_result.close()
+        finally:
+            self.cursor_result = None
+            self.pending_rows = []
+            connection.close()
+
+
+class ContinuationStore:
+    """Continuation tokens with idle-timeout eviction and a cap on held cursors.
+
+    The cap counts held continuations plus reservations: queries that may end up holding their
+    cursor reserve a slot before running, and fetch_more keeps one for a held cursor it popped.
+    """
+
+    def __init__(self, idle_timeout, max_tokens, max_held):
+        self.idle_timeout = idle_timeout
+        self.max_tokens = max_tokens
+        self.max_held = max_held
+        self._entries = OrderedDict()
+        self._reserved = 0
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def held(self):
+        """Number of held cursors, stored or reserved"""
+        with self._lock:
+            return self._reserved + sum(1 for entry in self._entries.values() if entry.held)
+
+    def can_hold(self):
+        self.evict_idle()
+        return self.held() < self.max_held
+
+    def reserve_hold(self):
+        """Reserve a held cursor slot if one is free; returns whether it was reserved.
+
+        Release it with release_hold once the result is stored (or not held).
+        """
+        self.evict_idle()
+        with self._lock:
+            held = sum(1 for entry in self._entries.values() if entry.held)
+            if self._reserved + held >= self.max_held:
+                return False
+            self._reserved += 1
+            return True
+
+    def release_hold(self):
+        with self._lock:
+            self._reserved -= 1
+
+    def add(self, continuation):
+        token = secrets.token_urlsafe(9)
+        with self._lock:
+            self._entries[token] = continuation
+            self._entries.move_to_end(token)
+            overflow = len(self._entries) - self.max_tokens
+            evicted = [
+                self._entries.popitem(last=False)[1] for _ in range(max(0, overflow))
+            ]
+            if continuation.held and self._sweeper is None:
+                # Held cursors pin pooled connections, so expire them even if no request comes
+                self._sweeper = threading.Thread(target=self._sweep, daemon=True)
+                self._sweeper.start()
+        for entry in evicted:
+            entry.release()
+        return token
+
+    def _sweep(self):
+        while True:
+            time.sleep(max(1.0, self.idle_timeout / 2))
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.warning(f"Failed to release idle cursor: {e}")
+
+    def fork(self, token):
+        """Add a copy of a continuation that resumes by re-executing, returning its token"""
+        with self._lock:
+            entry = self._entries.get(token)
+        if entry is None:
+            return None
+        return self.add(
+            Continuation(
+                entry.query,
+                entry.params,
+                entry.rows_shown,
+                entry.output_format,
+                columns=entry.columns,
+                timeout=entry.timeout,
+            )
+        )
+
+    def pop(self, token):
+        """Remove and return a continuation; a held one keeps its slot reserved (see release_hold)"""
+        self.evict_idle()
+        with self._lock:
+            entry = self._entries.pop(token, None)
+            if entry is not None and entry.held:
+                self._reserved += 1
+            return entry
+
+    def discard(self, token):
+        """Remove a continuation, releasing its held cursor"""
+        with self._lock:
+            entry = self._entries.pop(token, None)
+        if entry is not None:
+            entry.release()
+
+    def evict_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                token
+                for token, entry in self._entries.items()
+                if now - entry.last_used > self.idle_timeout
+            ]
+            evicted = [self._entries.pop(token) for token in expired]
+        for entry in evicted:
+            entry.release()
+
+
+CONTINUATION_PREFIX = "Continuation token: "
+CONTINUATIONS = ContinuationStore(
+    PAGINATION_IDLE_TIMEOUT, PAGINATION_MAX_TOKENS, PAGINATION_MAX_HELD_CURSORS
+)
+
+
+### Single Flight ###
+
+
+class SingleFlight:
+    """Run concurrent calls with the same key once, sharing the result.
+
+    Waiters cancelling (client disconnects) leave the shared call running for the others;
+    it is cancelled only when no waiter is left.
+    """
+
+    def __init__(self):
+        self.calls = {}  # key -> [task, waiters]
+        self.executions = 0
+        self.shared = 0
+
+    async def do(self, key, fn):
+        """Await fn() or an identical call already in flight; returns (result, shared)"""
+        entry = self.calls.get(key)
+        shared = entry is not None
+        if shared:
+            self.shared += 1
+        else:
+            self.executions += 1
+            entry = self.calls[key] = [asyncio.ensure_future(fn()), 0]
+            entry[0].add_done_callback(lambda _: self.forget(key, entry))
+
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0]), shared
+        except asyncio.CancelledError:
+            if entry[1] == 1:
+                entry[0].cancel()
+            raise
+        finally:
+            entry[1] -= 1
+
+    def forget(self, key, entry):
+        if self.calls.get(key) is entry:
+            del self.calls[key]
+
+
+SINGLE_FLIGHT = SingleFlight()
+CONTINUATION_TOKEN_RE = re.compile(re.escape(CONTINUATION_PREFIX) + r"(\S+)")
+
+
+def coalesce(key, fn):
+    """Await fn() through SINGLE_FLIGHT when enabled; fn must return the tool's output string.
+
+    Continuation tokens are single use, so callers sharing a paginated result each get their own.
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return fn()
+
+    async def call():
+        output, shared = await SINGLE_FLIGHT.do(key, fn)
+        if shared and CURRENT_CALL.get() is not None:
+            CURRENT_CALL.get().shared = True
+        match = shared and CONTINUATION_TOKEN_RE.search(output)
+        if match:
+            token = CONTINUATIONS.fork(match.group(1))
+            if token is not None:
+                output = output.replace(match.group(1), token, 1)
+        return output
+
+    return call()
+
 
+### MCP ###
 
-def get_connection():
-    global ENGINE
+mcp = FastMCP("MCP Alchemy")
+get_logger(__name__).info(f"Starting MCP Alchemy version {VERSION}")
+
+# Tools whose description ends with DB_INFO: name -> base description
+DB_INFO_TOOLS = {}
+WARM_UP_LOCK = threading.Lock()
+WARM_UP_THREAD = None
+
+
+def with_db_info(description):
+    return f"{description} {DB_INFO}" if DB_INFO else description
+
+
+def db_tool(description):
+    """mcp.tool whose description ends with DB_INFO, filled in after warm-up in lazy mode"""
 
+    def decorator(fn):
+        tool = mcp.tool(description=with_db_info(description))(metered(fn))
+        DB_INFO_TOOLS[fn.__name__] = description
+        return tool
+
+    return decorator
+
+
+def registered_tool(name):
+    """The server's Tool of that name (mcp.tool may return the plain function), or None.
+    Called from the warm-up thread, which has no event loop of its own."""
     try:
+        return asyncio.run(mcp.get_tool(name))
+    except Exception as e:
+        logger.debug(f"Tool lookup for {name} failed: {e}")
+        return None
+
+
+def warm_up():
+    """Resolve DB_INFO (creating the engine) and update tool descriptions that include it, then
+    revalidate the schema snapshot if one is configured"""
+    global DB_INFO
+
+    if DB_INFO is None:
+        started = time.perf_counter()
         try:
-            if ENGINE is None:
-                ENGINE = create_new_engine()
+            DB_INFO = get_db_info()
+        except Exception:
+            logger.exception("Warm-up failed, DB_INFO will be resolved on a later call")
+            return
+        record_startup_phase("db_info", started)
+
+        started = time.perf_counter()
+        for name, description in DB_INFO_TOOLS.items():
+            tool = registered_tool(name)
+            if tool is None:
+                logger.warning(f"Tool {name} not found, its description keeps no database info")
+                continue
+            tool.description = with_db_info(description)
+        record_startup_phase("tool_descriptions", started)
 
-            connection = ENGINE.connect()
+    if SCHEMA_SNAPSHOT_PATH:
+        started = time.perf_counter()
+        try:
+            run_db_blocking(refresh_schema_snapshot)
+        except Exception:
+            logger.exception("Could not refresh the schema snapshot")
+        record_startup_phase("schema_snapshot_refresh", started)
+    logger.info(f"Warm-up complete: {STARTUP_TIMINGS}")
 
-            # Set version variable for databases that support it
-            try:
-                # Assuming VERSION is defined globally later in the script
-                connection.execute(text(f"SET @mcp_alchemy_version = '{VERSION}'"))
-            except Exception:
-                # Some databases don't support session variables
-                pass
 
-            return connection
+def start_warm_up():
+    """Run warm_up in a background thread unless one is running"""
+    global WARM_UP_THREAD
 
-        except Exception as e:
-            logger.warning(f"First connection attempt failed: {e}")
+    with WARM_UP_LOCK:
+        if WARM_UP_THREAD is None or not WARM_UP_THREAD.is_alive():
+            WARM_UP_THREAD = threading.Thread(target=warm_up, daemon=True)
+            WARM_UP_THREAD.start()
 
-            # Database might have restarted or network dropped - start fresh
-            if ENGINE is not None:
-                try:
-                    ENGINE.dispose()
-                except Exception:
-                    pass
 
-            # One retry with fresh engine handles most transient failures
-            ENGINE = create_new_engine()
-            connection = ENGINE.connect()
+def table_names_and_families(conn):
+    return get_name_index(conn).names("table"), SCHEMA_FAMILIES.get(conn)
 
-            return connection
 
+@db_tool(
+    "Return all table names in the database separated by comma. Tables that repeat all columns of "
+    "another table plus a few of their own, named like X_trace, are folded into it as 'X (+_trace)'."
+)
+async def all_table_names() -> str:
+    names, families = await run_db(table_names_and_families)
+    suffixes = defaultdict(list)
+    for base, suffix in families.values():
+        suffixes[base].append(suffix)
+    return ", ".join(
+        f"{name} (+{', '.join(suffixes[name])})" if name in suffixes else name
+        for name in names
+        if name not in families
+    )
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:,.0f} {unit}" if unit == "B" else f"{size:,.1f} {unit}"
+        size /= 1024
+
+
+@db_tool(
+    "Return estimated row counts and sizes (table plus indexes) for the given tables, or for all "
+    "tables ranked by size when table_names is omitted, at most 'limit' tables (0 for all). Estimates "
+    "come from catalog statistics, so they are cheap but approximate; prefer this over SELECT COUNT(*) "
+    f"to gauge table sizes. They are cached and refreshed in the background every {TABLE_STATS_TTL:g} "
+    "seconds. Set exact=true to run COUNT(*) on the given table_names instead."
+)
+async def table_stats(
+    table_names: list[str] = None, exact: bool = False, limit: int = 0
+) -> str:
+    if exact and not table_names:
+        return "Error: exact counts run COUNT(*) on every table; pass the table_names to count."
+
+    database = database_identity()
+    try:
+        cached = TABLE_STATS.get(database)
+        if cached is None:
+            stats, age = await asyncio.shield(TABLE_STATS.refresh(database)), 0
+        else:
+            stats, age = cached
+            if age > TABLE_STATS_TTL:
+                TABLE_STATS.refresh(database)
+        counted = [name for name in table_names or () if name in stats]
+        counts = await run_db(exact_row_counts, counted) if exact else {}
     except Exception as e:
-        logger.exception("Failed to get database connection after retry")
-        raise
+        record_error(e)
+        return f"Error: {str(e)}"
+
+    if table_names:
+        names = table_names
+    else:
+        names = sorted(stats, key=lambda name: (-(stats[name].rows or 0), name))
+    if limit > 0:
+        names = names[:limit]
+
+    output = []
+    for name in names:
+        if name not in stats:
+            output.append(f"{name}: table not found")
+            continue
+        stat = stats[name]
+        if isinstance(counts.get(name), Exception):
+            rows = f"count failed ({counts[name]})"
+        elif name in counts:
+            rows = f"{counts[name]:,} rows (exact)"
+        elif stat.rows is not None:
+            rows = f"~{stat.rows:,} rows"
+        else:
+            rows = "rows unknown"
+        size = f", {format_bytes(stat.bytes)}" if stat.bytes is not None else ""
+        output.append(f"{name}: {rows}{size}")
+    if len(names) < len(table_names or stats):
+        output.append(f"... {len(table_names or stats) - len(names)} more tables")
+    output.append(f"Estimates collected {age:.0f}s ago")
+    return "\n".join(output)
+
+
+@db_tool(
+    "Return table names in the database matching 'q' separated by comma, best matches first: "
+    "exact, prefix, whole '_'-separated words, substring, then similar spellings. At most 'limit' names "
+    "are returned. Set include_views to also search views and include_columns to also search column "
+    "names (returned as table.column)."
+)
+async def filter_table_names(
+    q: str,
+    limit: int = FILTER_TABLE_NAMES_LIMIT,
+    include_views: bool = False,
+    include_columns: bool = False,
+) -> str:
+    if not q.strip():
+        return ""
+    kinds = ["table"]
+    if include_views:
+        kinds.append("view")
+    if include_columns:
+        kinds.append("column")
+    index = await run_db(get_name_index, include_columns)
+    return ", ".join(index.search(q, limit, kinds))
+
+
+def format_column(column, primary_keys):
+    show_key_only = {"nullable", "autoincrement"}
+    # Copy so the cached reflection data is left untouched
+    column = dict(column)
+    column.pop("comment", None)
+    name = column.pop("name")
+    column_parts = (
+        (["primary key"] if name in primary_keys else [])
+        + [str(column.pop("type"))]
+        + [k if k in show_key_only else f"{k}={v}" for k, v in column.items() if v]
+    )
+    return f"    {name}: " + ", ".join(column_parts)
 
 
-def get_db_info():
-    with get_connection() as conn:
-        engine = conn.engine
-        url = engine.url
-        result = [
-            f"Connected to {engine.dialect.name}",
-            f"version {'.'.join(str(x) for x in engine.dialect.server_version_info)}",
-            f"database {url.database}",
+def format_schema(table_name, info, base=None, base_info=None):
+    """Format reflected table info; a family member (see SCHEMA_FAMILIES) whose base table is
+    shown too only lists what it adds to the base"""
+    primary_keys = set(info["primary_keys"])
+
+    # Process columns
+    if base is None:
+        result = [f"{table_name}:"]
+        columns = info["columns"]
+    else:
+        base_nullable = {column["name"]: column["nullable"] for column in base_info["columns"]}
+        shared = [column for column in info["columns"] if column["name"] in base_nullable]
+        columns = [column for column in info["columns"] if column["name"] not in base_nullable]
+        now_nullable = [
+            column["name"]
+            for column in shared
+            if column["nullable"] and not base_nullable[column["name"]]
         ]
+        if now_nullable and all(column["nullable"] for column in shared):
+            result = [f"{table_name}: same columns as {base} (all nullable), plus:"]
+        else:
+            result = [f"{table_name}: same columns as {base}, plus:"]
+            if now_nullable:
+                result.append(f"    (nullable here: {', '.join(now_nullable)})")
+        if info["primary_keys"] != base_info["primary_keys"]:
+            result.append(f"    (primary key: {', '.join(info['primary_keys'])})")
+    for column in columns:
+        result.append(format_column(column, primary_keys))
+
+    # Process relationships
+    if info["foreign_keys"]:
+        result.extend(["", "    Relationships:"])
+        for fk in info["foreign_keys"]:
+            constrained_columns = ", ".join(fk["constrained_columns"])
+            referred_table = fk["referred_table"]
+            referred_columns = ", ".join(fk["referred_columns"])
+            result.append(
+                f"        {constrained_columns} -> {referred_table}.{referred_columns}"
+            )
 
-        if url.host:
-            result.append(f"on {url.host}")
+    return "\n".join(result)
 
-        if url.username:
-            result.append(f"as user {url.username}")
 
-        return " ".join(result) + "."
+def table_schemas_and_families(conn, table_names):
+    """Reflected info of the tables and the families among them. Members are only shown as what
+    they add when their base is requested too, so the whole-database SCHEMA_FAMILIES (and the
+    column reflection it needs) is left to all_table_names."""
+    schemas = get_table_schemas(conn, table_names)
+    families = {}
+    if SCHEMA_FAMILY_SUFFIXES:
+        families = schema_families(
+            {table_name: info["columns"] for table_name, info in schemas.items()}, conn.dialect
+        )
+    return schemas, families
 
 
-### Constants ###
+@db_tool(
+    "Returns schema and relation information for the given tables. A table like X_trace that "
+    "repeats all columns of X, requested together with X, is shown as what it adds to X."
+)
+async def schema_definitions(table_names: list[str]) -> str:
+    key = ("schema_definitions", database_identity(), tuple(table_names))
+    return await coalesce(key, lambda: render_schema_definitions(table_names))
+
+
+async def render_schema_definitions(table_names):
+    schemas, families = await run_db(table_schemas_and_families, table_names)
+
+    if OUTPUT_BUDGET_MODE == "tokens":
+        budget = SCHEMA_DEFINITIONS_MAX_TOKENS
+    else:
+        budget = SCHEMA_DEFINITIONS_MAX_CHARS
+    # Family members only list their additions when their base table is shown, so bases go first
+    requested = set(table_names)
+    bases_first = sorted(
+        table_names,
+        key=lambda name: name in families and families[name][0] in requested,
+    )
+    parts, size, omitted, shown = [], 0, [], set()
+    for table_name in bases_first:
+        base = families.get(table_name, (None,))[0]
+        if base in shown:
+            part = format_schema(table_name, schemas[table_name], base, schemas[base])
+        else:
+            part = format_schema(table_name, schemas[table_name])
+        cost = lines_size(part.split("\n") + [""])
+        if budget and size + cost > budget:
+            omitted.append(table_name)
+        else:
+            parts.append(part)
+            size += cost
+            shown.add(table_name)
+    if omitted:
+        parts.append(
+            f"Omitted to stay within {budget_description(budget)}: {', '.join(omitted)}"
+        )
+    return size_report("\n\n".join(parts))
 
-VERSION = "1.0.0"
-DB_INFO = get_db_info()
-EXECUTE_QUERY_MAX_CHARS = int(os.environ.get("EXECUTE_QUERY_MAX_CHARS", 4000))
-READ_ONLY_MODE = os.environ.get("READ_ONLY_MODE", "true").lower() == "true"
 
-### MCP ###
+@db_tool(
+    "Return the shortest chain of joins along foreign keys (in either direction) from one table to "
+    "another, as FROM/JOIN lines with ready-to-use ON clauses. Pass exclude_tables to route around "
+    "tables, e.g. ones that nearly every table references."
+)
+async def find_join_path(
+    from_table: str, to_table: str, exclude_tables: list[str] = None
+) -> str:
+    graph = await run_db(FK_GRAPHS.get)
+    for table in (from_table, to_table):
+        if table not in graph.tables:
+            return f"Error: Unknown table '{table}'"
+
+    path = graph.join_path(from_table, to_table, set(exclude_tables or ()))
+    if path is None:
+        return f"No foreign key path from {from_table} to {to_table}"
+    output = [f"FROM {graph.quote(from_table)}"]
+    for table, fk in path:
+        output.append(f"JOIN {graph.quote(table)} ON {graph.join_condition(fk)}")
+    output.append(f"({len(path)} joins)")
+    return "\n".join(output)
+
+
+@db_tool(
+    "Return the foreign keys of a table in both directions: the tables it references and the "
+    "tables that reference it."
+)
+async def table_references(table_name: str) -> str:
+    graph = await run_db(FK_GRAPHS.get)
+    if table_name not in graph.tables:
+        return f"Error: Unknown table '{table_name}'"
 
-mcp = FastMCP("MCP Alchemy")
-get_logger(__name__).info(f"Starting MCP Alchemy version {VERSION}")
+    output = ["References:"]
+    output += [f"    {graph.describe(fk)}" for fk in graph.outgoing[table_name]] or ["    none"]
+    output.append("Referenced by:")
+    output += [f"    {graph.describe(fk)}" for fk in graph.incoming[table_name]] or ["    none"]
+    return "\n".join(output)
 
 
 @mcp.tool(
-    description=f"Return all table names in the database separated by comma. {DB_INFO}"
+    description="Clear cached schema information so the next schema_definitions call reflects the "
+    "database again. Optionally limit to the given tables."
 )
-def all_table_names() -> str:
-    with get_connection() as conn:
-        inspector = inspect(conn)
-        return ", ".join(inspector.get_table_names())
+@metered
+async def refresh_schema_cache(table_names: list[str] = None) -> str:
+    url = await run_db(engine_key)
+    dropped = SCHEMA_CACHE.invalidate(url, set(table_names) if table_names else None)
+    with NAME_INDEXES_LOCK:
+        NAME_INDEXES.pop(url, None)
+    FK_GRAPHS.invalidate(url)
+    SCHEMA_FAMILIES.invalidate(url)
+    return f"Schema cache cleared: {dropped} tables dropped"
 
 
-@mcp.tool(
-    description=f"Return all table names in the database containing the substring 'q' separated by comma. {DB_INFO}"
-)
-def filter_table_names(q: str) -> str:
-    with get_connection() as conn:
-        inspector = inspect(conn)
-        # Convert query to lowercase for case-insensitive matching
-        q_lower = q.lower().strip()
-        if not q_lower:
-            return ""
-        # Filter table names with case-insensitive matching
-        matching_tables = [
-            x for x in inspector.get_table_names() if q_lower in x.lower()
-        ]
-        return ", ".join(matching_tables)
+@mcp.resource("stats://startup", mime_type="application/json")
+def startup_stats_resource() -> str:
+    """Startup phase timings in milliseconds"""
+    return json.dumps(STARTUP_TIMINGS, indent=2)
+
+
+@mcp.resource("stats://pool", mime_type="application/json")
+def pool_stats_resource() -> str:
+    """Connection pool statistics"""
+    return json.dumps(POOL_STATS.snapshot(ENGINE), indent=2)
 
 
 @mcp.tool(
-    description=f"Returns schema and relation information for the given tables. {DB_INFO}"
+    description="Return connection pool statistics: pool size, checked-out connections, overflow, "
+    "checkout counts, pool timeouts and a checkout latency histogram."
 )
-def schema_definitions(table_names: list[str]) -> str:
-    def format_schema(inspector, table_name):
-        columns = inspector.get_columns(table_name)
-        foreign_keys = inspector.get_foreign_keys(table_name)
-        primary_keys = set(
-            inspector.get_pk_constraint(table_name)["constrained_columns"]
-        )
-        result = [f"{table_name}:"]
+@metered
+def pool_stats() -> str:
+    return json.dumps(POOL_STATS.snapshot(ENGINE), indent=2)
 
-        # Process columns
-        show_key_only = {"nullable", "autoincrement"}
-        for column in columns:
-            if "comment" in column:
-                del column["comment"]
-            name = column.pop("name")
-            column_parts = (
-                (["primary key"] if name in primary_keys else [])
-                + [str(column.pop("type"))]
-                + [
-                    k if k in show_key_only else f"{k}={v}"
-                    for k, v in column.items()
-                    if v
-                ]
-            )
-            result.append(f"    {name}: " + ", ".join(column_parts))
-
-        # Process relationships
-        if foreign_keys:
-            result.extend(["", "    Relationships:"])
-            for fk in foreign_keys:
-                constrained_columns = ", ".join(fk["constrained_columns"])
-                referred_table = fk["referred_table"]
-                referred_columns = ", ".join(fk["referred_columns"])
-                result.append(
-                    f"        {constrained_columns} -> {referred_table}.{referred_columns}"
-                )
 
-        return "\n".join(result)
+@mcp.resource("stats://tools", mime_type="application/json")
+def tool_stats_resource() -> str:
+    """Per-tool call counts, errors, rows, output bytes and latency histograms (total and per phase)"""
+    return json.dumps(TOOL_METRICS.snapshot(), indent=2)
 
-    with get_connection() as conn:
-        inspector = inspect(conn)
-        return "\n\n".join(
-            format_schema(inspector, table_name) for table_name in table_names
-        )
+
+@mcp.custom_route(METRICS_PATH, methods=["GET"])
+async def metrics_endpoint(request):
+    """Tool and pool metrics for Prometheus, served next to the MCP endpoint"""
+    return PlainTextResponse(prometheus_metrics(), media_type="text/plain; version=0.0.4")
 
 
 def is_cud_operation(query):
@@ -220,24 +2397,1021 @@ def is_cud_operation(query):
     return first_keyword in cud_keywords
 
 
+def is_select_query(query):
+    """Check if the query is a plain SELECT statement"""
+    words = query.strip().split(None, 1)
+    return bool(words) and words[0].upper() == "SELECT"
+
+
+READ_QUERY_RE = re.compile(r"^\s*(?:\(|(?:SELECT|WITH|VALUES|TABLE)\b)", re.IGNORECASE)
+
+
+def is_read_query(query):
+    """Check if the query reads rows: a SELECT, possibly behind WITH or in parentheses"""
+    return READ_QUERY_RE.match(query) is not None and not is_cud_operation(query)
+
+
+def strip_query(query):
+    """Strip whitespace and trailing semicolons so the query can be embedded in another"""
+    return query.strip().rstrip(";").rstrip()
+
+
+# Smallest possible cost of one row per output format, in chars and in estimated tokens.
+# Vertical rows are at least "1. row\n" + "\n", header-once rows can be a single empty value.
+MIN_ROW_COST = {
+    "chars": {"vertical": 8, "markdown": 5, "jsonl": 3},
+    "tokens": {"vertical": 5},
+}
+
+
+def auto_limit_rows(output_format, budget=None):
+    """Most rows format_result could show within the output budget, plus one to detect truncation"""
+    if budget is None:
+        budget = query_output_budget()
+    if output_format == "auto":
+        output_format = min(
+            AUTO_FORMATS, key=lambda f: MIN_ROW_COST[OUTPUT_BUDGET_MODE].get(f, 1)
+        )
+    return budget // MIN_ROW_COST[OUTPUT_BUDGET_MODE].get(output_format, 1) + 1
+
+
+def limit_query(query, dialect_name, limit):
+    """Return the query rewritten to fetch at most `limit` rows, or None if the dialect is not supported"""
+    query = strip_query(query)
+    if dialect_name in ("sqlite", "postgresql", "mysql", "mariadb"):
+        return f"SELECT * FROM ({query}) AS mcp_limited LIMIT {limit}"
+    if dialect_name == "oracle":
+        return f"SELECT * FROM ({query}) mcp_limited FETCH FIRST {limit} ROWS ONLY"
+    if dialect_name == "mssql":
+        # Derived tables cannot carry ORDER BY on SQL Server, so add TOP to the query itself
+        head, rest = query[:6], query[6:].lstrip()
+        if rest.upper().startswith("TOP"):
+            return None
+        if rest.upper().startswith("DISTINCT "):
+            return f"{head} DISTINCT TOP {limit} {rest[9:]}"
+        return f"{head} TOP {limit} {rest}"
+    return None
+
+
+# Errors of databases that refuse SELECT * over a derived table repeating a column name, such as
+# SELECT * FROM a JOIN b wrapped by limit_query. PostgreSQL accepts it; SQLite does too but renames
+# the repeats (see renamed_duplicates)
+DUPLICATE_COLUMN_ERRORS = {"mysql": "1060", "mariadb": "1060", "oracle": "ORA-00918"}
+
+
+def is_duplicate_column_error(dialect_name, error):
+    """Whether the database rejected a derived-table rewrite because of repeated column names"""
+    code = DUPLICATE_COLUMN_ERRORS.get(dialect_name)
+    return code is not None and code in str(getattr(error, "orig", error))
+
+
+def renamed_duplicates(names):
+    """Whether SQLite renamed repeated column names of a derived table, e.g. id, id:1"""
+    seen = set()
+    for name in names:
+        base, colon, number = name.rpartition(":")
+        if colon and number.isdigit() and base in seen:
+            return True
+        seen.add(name)
+    return False
+
+
+def count_query(query, dialect_name):
+    """Return a query counting the rows the given SELECT would produce"""
+    alias = " mcp_count" if dialect_name == "oracle" else " AS mcp_count"
+    return f"SELECT COUNT(*) FROM ({strip_query(query)}){alias}"
+
+
+QueryPlan = namedtuple("QueryPlan", ["lines", "scans"])
+# A full table scan: estimated rows it reads, and the row limit that can stop it early (or None)
+Scan = namedtuple("Scan", ["table", "rows", "limit"])
+
+# FROM/JOIN targets with optional alias, to map the aliases SQLite plans report back to tables
+TABLE_REFERENCE_RE = re.compile(
+    r"\b(?:FROM|JOIN)\s+((?:[\w$]+|\"[^\"]+\")(?:\.(?:[\w$]+|\"[^\"]+\"))?)"
+    r"(?:\s+(?:AS\s+)?([\w$]+|\"[^\"]+\"))?",
+    re.IGNORECASE,
+)
+NOT_ALIASES = {
+    "WHERE", "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "NATURAL", "ON", "USING",
+    "GROUP", "ORDER", "LIMIT", "HAVING", "UNION", "EXCEPT", "INTERSECT", "WINDOW", "OFFSET",
+}  # fmt: skip
+SQLITE_SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\S+)")
+POSTGRESQL_SCAN_RE = re.compile(r"Seq Scan on (\S+)")
+# Plan node lines, e.g. "  ->  Seq Scan on attachment a  (cost=0.00..213.25 rows=11725 width=32)"
+POSTGRESQL_NODE_RE = re.compile(r"^(\s*)(?:->\s+)?(.+?)\s+\(cost=\S+ rows=(\d+)")
+# Nodes that read all their input before passing rows up to a Limit
+POSTGRESQL_BLOCKING_NODES = (
+    "Sort", "Incremental Sort", "Aggregate", "HashAggregate", "GroupAggregate", "Hash",
+    "Materialize", "WindowAgg", "Unique", "SetOp", "HashSetOp", "Finalize", "Partial",
+)  # fmt: skip
+STATEMENT_LIMIT_RE = re.compile(
+    r"\b(?:LIMIT\s+(\d+)(?:\s*,\s*(\d+)|\s+OFFSET\s+(\d+))?"
+    r"|(?:OFFSET\s+(\d+)\s+ROWS?\s+)?FETCH\s+(?:FIRST|NEXT)\s+(\d+)\s+ROWS?\s+ONLY)\s*$",
+    re.IGNORECASE,
+)
+# Statements that read every row before their LIMIT applies
+READS_ALL_ROWS_RE = re.compile(
+    r"\b(?:COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT|STRING_AGG|ARRAY_AGG)\s*\("
+    r"|\bGROUP\s+BY\b|\bDISTINCT\b|\bOVER\s*\(",
+    re.IGNORECASE,
+)
+WHERE_RE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+
+
+def table_aliases(query):
+    """Map the aliases (and names) of tables referenced in FROM/JOIN clauses to table names"""
+    aliases = {}
+    for table, alias in TABLE_REFERENCE_RE.findall(query):
+        table = table.split(".")[-1].strip('"')
+        aliases[table] = table
+        if alias and alias.upper() not in NOT_ALIASES:
+            aliases[alias.strip('"')] = table
+    return aliases
+
+
+def approximate_row_count(connection, table_name):
+    """Cheap row count estimate for a table, or None if unknown (or not a table)"""
+    dialect_name = connection.engine.dialect.name
+    try:
+        if dialect_name == "sqlite":
+            # Rowids are assigned in increasing order, so max(rowid) is an index lookup away
+            quoted = connection.dialect.identifier_preparer.quote(table_name)
+            count = connection.execute(text(f"SELECT max(rowid) FROM {quoted}")).scalar()
+            return count or 0
+        if dialect_name == "postgresql":
+            count = connection.execute(
+                text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)"),
+                {"name": table_name},
+            ).scalar()
+            # Never analyzed tables report -1
+            return int(count) if count is not None and count >= 0 else None
+        if dialect_name in ("mysql", "mariadb"):
+            return connection.execute(
+                text(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name"
+                ),
+                {"name": table_name},
+            ).scalar()
+    except Exception as e:
+        logger.debug(f"No row count estimate for {table_name}: {e}")
+    return None
+
+
+def statement_limit(query, limit=None):
+    """Most rows a SELECT reads to return its result, from its own trailing LIMIT and OFFSET
+    and the limit wrapped around it, or None if unbounded or it aggregates, groups or
+    deduplicates"""
+    if READS_ALL_ROWS_RE.search(query):
+        return None
+    match = STATEMENT_LIMIT_RE.search(query)
+    if match:
+        first, comma_count, limit_offset, fetch_offset, fetch_count = (
+            int(number) if number else 0 for number in match.groups()
+        )
+        if match.group(2):  # MySQL's LIMIT offset, count
+            count, offset = comma_count, first
+        else:
+            count, offset = first or fetch_count, limit_offset or fetch_offset
+        # Skipped rows are read whatever limit wraps the statement
+        limit = offset + (count if limit is None else min(count, limit))
+    return limit
+
+
+def bounded_scan(table, rows, limit, filtered):
+    """Scan of a table under a row limit: unfiltered, it stops after `limit` rows; filtered (or an
+    inner loop of a join) it may read further to find them, so only the limit is noted"""
+    if limit is None or rows is None or limit >= rows:
+        return Scan(table, rows, None)
+    if filtered:
+        return Scan(table, rows, limit)
+    return Scan(table, min(rows, limit), limit)
+
+
+def postgresql_limited_reads(scan_rows, table_rows, ancestors):
+    """(rows limit, estimated rows read) of a Seq Scan whose nearest reading-all ancestor is a
+    Limit node, else (None, table_rows); ancestors are (node, estimated rows), innermost last"""
+    for node, rows in reversed(ancestors):
+        if node.startswith("Limit"):
+            if not scan_rows:
+                return rows, table_rows
+            # Matching rows are spread through the table, so a Limit stops after its share of it
+            reads = -(-rows * table_rows // scan_rows)
+            return rows, min(table_rows, reads)
+        if node.startswith(POSTGRESQL_BLOCKING_NODES) and not node.startswith("Hash Join"):
+            break
+    return None, table_rows
+
+
+def explain_plan(connection, query, params, limit=None):
+    """Return the QueryPlan of a query, or None if the dialect is not supported.
+
+    scans lists a Scan for every full table scan in the plan. limit is the row limit the query
+    will run with (the auto limit), in addition to its own LIMIT.
+    """
+    dialect_name = connection.engine.dialect.name
+    query = strip_query(query)
+    lines, scans = [], []
+    bound = statement_limit(query, limit)
+    filtered = WHERE_RE.search(query) is not None
+
+    if dialect_name == "sqlite":
+        aliases = table_aliases(query)
+        depths = {}
+        for node_id, parent, _, detail in connection.execute(
+            text(f"EXPLAIN QUERY PLAN {query}"), params
+        ):
+            depths[node_id] = depths.get(parent, -1) + 1
+            lines.append("  " * depths[node_id] + detail)
+            match = SQLITE_SCAN_RE.match(detail)
+            if match and match.group(1) in aliases:
+                table = aliases[match.group(1)]
+                rows = approximate_row_count(connection, table)
+                if rows is not None:  # None: a CTE or subquery rather than a table
+                    scans.append((table, rows))
+        if any("USE TEMP B-TREE" in line for line in lines):
+            bound = None  # sorting or deduplicating reads every row first
+        scans = [
+            bounded_scan(table, rows, bound, filtered or i > 0)
+            for i, (table, rows) in enumerate(scans)
+        ]
+    elif dialect_name == "postgresql":
+        if limit is not None:
+            query = limit_query(query, dialect_name, limit)
+        ancestors = []  # (indent, node, estimated rows) of the nodes above the current line
+        for (line,) in connection.execute(text(f"EXPLAIN {query}"), params):
+            lines.append(line)
+            node = POSTGRESQL_NODE_RE.match(line)
+            if node is None:
+                continue
+            indent, name, rows = len(node.group(1)), node.group(2), int(node.group(3))
+            while ancestors and ancestors[-1][0] >= indent:
+                ancestors.pop()
+            match = POSTGRESQL_SCAN_RE.search(name)
+            if match:
+                table = match.group(1)
+                table_rows = approximate_row_count(connection, table)
+                if table_rows is None:
+                    table_rows = rows
+                scan_limit, reads = postgresql_limited_reads(
+                    rows, table_rows, [entry[1:] for entry in ancestors]
+                )
+                scans.append(Scan(table, reads, scan_limit))
+            ancestors.append((indent, name, rows))
+    elif dialect_name in ("mysql", "mariadb"):
+        plan_rows = list(connection.execute(text(f"EXPLAIN {query}"), params).mappings())
+        for row in plan_rows:
+            line = f"{row['select_type']} {row['table']}: type={row['type']} key={row['key']} rows={row['rows']}"
+            lines.append(f"{line} ({row['Extra']})" if row.get("Extra") else line)
+        if any(
+            "Using filesort" in (row.get("Extra") or "")
+            or "Using temporary" in (row.get("Extra") or "")
+            for row in plan_rows
+        ):
+            bound = None
+        for i, row in enumerate(plan_rows):
+            if row["type"] == "ALL" and row["table"]:
+                # MySQL estimates the rows it examines itself
+                row_filtered = i > 0 or "Using where" in (row.get("Extra") or "")
+                scans.append(bounded_scan(row["table"], row["rows"], bound, row_filtered))
+    else:
+        return None
+    return QueryPlan(lines, scans)
+
+
+def describe_scan(scan):
+    rows = f"~{scan.rows:,} rows" if scan.rows is not None else "rows unknown"
+    if scan.limit is not None:
+        rows += f", limited to {scan.limit:,}"
+    return f"{scan.table} ({rows})"
+
+
+def large_scans(plan):
+    """The plan's full scans reading FULL_SCAN_ROW_THRESHOLD rows or more"""
+    return [
+        scan
+        for scan in plan.scans
+        if scan.rows is not None and scan.rows >= FULL_SCAN_ROW_THRESHOLD
+    ]
+
+
+def describe_large_scans(scans):
+    described = ", ".join(describe_scan(scan) for scan in scans)
+    return f"full scan of {described}, above the {FULL_SCAN_ROW_THRESHOLD:,} row threshold"
+
+
+class QueryRejected(Exception):
+    pass
+
+
+def check_query_cost(connection, query, params, limit=None):
+    """Apply QUERY_COST_GUARD to a query: raise QueryRejected or return a warning line (or None).
+
+    Large scans a row limit may stop early (a filtered scan under LIMIT) only warn.
+    """
+    try:
+        with phase("explain"):
+            plan = explain_plan(connection, query, params, limit)
+    except Exception as e:
+        logger.debug(f"Could not explain query for the cost guard: {e}")
+        return None
+    scans = large_scans(plan) if plan else []
+    if not scans:
+        return None
+    problem = describe_large_scans(scans)
+    if QUERY_COST_GUARD == "reject" and any(scan.limit is None for scan in scans):
+        raise QueryRejected(
+            f"Query rejected by the cost guard: {problem}. Filter on an indexed column, "
+            "or inspect the plan with explain_query."
+        )
+    return f"Warning: {problem}. The query may be slow."
+
+
+class TruncatedValue:
+    """Leading part of a cell value that project_cells cut short in the database"""
+
+    def __init__(self, prefix, length):
+        self.prefix = prefix
+        self.length = length
+
+
+def format_value(val):
+    """Format a value for display, handling None, datetime, binary and overly long values"""
+    if val is None:
+        return "NULL"
+    if isinstance(val, TruncatedValue):
+        if isinstance(val.prefix, (bytes, bytearray, memoryview)):
+            return f"<{val.length} bytes>"
+        return f"{val.prefix}... [{val.length} chars]"
+    if isinstance(val, (bytes, bytearray, memoryview)):
+        data = bytes(val)
+        return f"<{len(data)} bytes, sha1 {hashlib.sha1(data).hexdigest()[:12]}>"
+    if isinstance(val, (datetime, date)):
+        return val.isoformat()
+    text_value = str(val)
+    if 0 < EXECUTE_QUERY_MAX_CELL_CHARS < len(text_value):
+        return f"{text_value[:EXECUTE_QUERY_MAX_CELL_CHARS]}... [{len(text_value)} chars]"
+    return text_value
+
+
+# Driver type codes (cursor.description) of columns that can hold large values
+POSTGRESQL_TEXT_TYPES = {25, 1043}  # text, varchar
+POSTGRESQL_CAST_TYPES = {114, 142, 3802}  # json, xml, jsonb
+POSTGRESQL_BINARY_TYPES = {17}  # bytea
+MYSQL_LOB_TYPES = {245, 249, 250, 251, 252}  # json, tiny/medium/long/blob (and TEXT)
+
+
+def cell_expressions(dialect_name, column, type_code, limit):
+    """SQL for a column's value cut to `limit` and its full length when longer, or None to keep it"""
+    if dialect_name == "sqlite":
+        # Dynamic typing: length() is only above the limit for long text/blob values
+        cut = f"substr({column}, 1, {limit})"
+        length = f"length({column})"
+    elif dialect_name == "postgresql":
+        if type_code in POSTGRESQL_BINARY_TYPES:
+            cut = f"substring({column} from 1 for {limit})"
+        elif type_code in POSTGRESQL_TEXT_TYPES | POSTGRESQL_CAST_TYPES:
+            if type_code in POSTGRESQL_CAST_TYPES:
+                column = f"{column}::text"
+            cut = f"left({column}, {limit})"
+        else:
+            return None
+        length = f"length({column})"
+    elif dialect_name in ("mysql", "mariadb"):
+        if type_code not in MYSQL_LOB_TYPES:
+            return None
+        cut = f"LEFT({column}, {limit})"
+        length = f"CHAR_LENGTH({column})"
+    else:
+        return None
+    return (
+        f"CASE WHEN {length} > {limit} THEN {cut} ELSE {column} END",
+        f"CASE WHEN {length} > {limit} THEN {length} END",
+    )
+
+
+def project_cells(connection, statement, params):
+    """Rewrite a SELECT so long text/binary cells are cut to EXECUTE_QUERY_MAX_CELL_CHARS by the
+    database. Returns the statement and {value index: length column index}, or the statement
+    unchanged and None when it cannot be rewritten."""
+    dialect_name = connection.engine.dialect.name
+    limit = EXECUTE_QUERY_MAX_CELL_CHARS
+    probe = limit_query(statement, dialect_name, 0)
+    if limit <= 0 or dialect_name not in ("sqlite", "postgresql", "mysql", "mariadb"):
+        return statement, None
+
+    # Column names and driver types, without fetching any rows
+    try:
+        probe_result = connection.execute(text(probe), params)
+    except DBAPIError as e:
+        if is_duplicate_column_error(dialect_name, e):
+            return statement, None
+        raise
+    description = probe_result.cursor.description
+    probe_result.close()
+    names = [column[0] for column in description]
+    if len(set(names)) != len(names) or renamed_duplicates(names):
+        # Duplicate names cannot be referenced through the derived table; SQLite's probe, itself
+        # a derived table, shows them renamed
+        return statement, None
+
+    quote = connection.dialect.identifier_preparer.quote
+    values, lengths, length_columns = [], [], {}
+    for i, column in enumerate(description):
+        name = quote(column[0])
+        expressions = cell_expressions(dialect_name, name, column[1], limit)
+        if expressions is None:
+            values.append(name)
+            continue
+        values.append(f"{expressions[0]} AS {name}")
+        length_columns[i] = len(names) + len(lengths)
+        lengths.append(f"{expressions[1]} AS {quote(f'mcp_length_{i}')}")
+
+    if not length_columns:
+        return statement, None
+    select_list = ", ".join(values + lengths)
+    return f"SELECT {select_list} FROM ({strip_query(statement)}) AS mcp_cells", length_columns
+
+
+class ProjectedResult:
+    """Cursor result of a project_cells statement, presenting the original columns with cut
+    cells folded into TruncatedValue"""
+
+    returns_rows = True
+
+    def __init__(self, cursor_result, length_columns):
+        self.cursor_result = cursor_result
+        self.length_columns = length_columns
+        self.width = len(cursor_result.keys()) - len(length_columns)
+
+    @property
+    def connection(self):
+        return self.cursor_result.connection
+
+    def keys(self):
+        return list(self.cursor_result.keys())[: self.width]
+
+    def fetchmany(self, size):
+        return [self.fold(row) for row in self.cursor_result.fetchmany(size)]
+
+    def fetchone(self):
+        row = self.cursor_result.fetchone()
+        return None if row is None else self.fold(row)
+
+    def close(self):
+        self.cursor_result.close()
+
+    def fold(self, row):
+        values = list(row[: self.width])
+        for value_index, length_index in self.length_columns.items():
+            if row[length_index] is not None:
+                values[value_index] = TruncatedValue(values[value_index], row[length_index])
+        return values
+
+
+class RowReader:
+    """Iterate the cursor's rows one at a time, counting them and timing the fetches.
+
+    The streamed result already buffers EXECUTE_QUERY_FETCH_SIZE rows (max_row_buffer); taking
+    them one by one leaves the rows after a truncation with the cursor, for a held continuation.
+    """
+
+    def __init__(self, cursor_result):
+        self.cursor_result = cursor_result
+        self.fetched = 0
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        row = self.cursor_result.fetchone()
+        self.seconds += time.perf_counter() - started
+        if row is None:
+            raise StopIteration
+        self.fetched += 1
+        return row
+
+
+def escape_tsv(text):
+    return (
+        text.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(values)
+    return buffer.getvalue()
+
+
+def markdown_cell(text):
+    return text.replace("|", "\\|").replace("\r", " ").replace("\n", " ")
+
+
+def json_value(val):
+    if val is None or isinstance(val, (bool, int, float)):
+        return val
+    return format_value(val)
+
+
+def format_header(output_format, keys):
+    """Lines shown once before the rows of a page"""
+    if output_format == "tsv":
+        return ["\t".join(escape_tsv(str(key)) for key in keys)]
+    if output_format == "csv":
+        return [csv_line(keys)]
+    if output_format == "markdown":
+        return [
+            "| " + " | ".join(markdown_cell(str(key)) for key in keys) + " |",
+            "|" + "---|" * len(keys),
+        ]
+    if output_format == "jsonl":
+        return [json.dumps({"columns": list(keys)})]
+    return []
+
+
+def format_row(output_format, keys, row_number, row):
+    """Lines for a single row"""
+    if output_format == "tsv":
+        return ["\t".join(escape_tsv(format_value(val)) for val in row)]
+    if output_format == "csv":
+        return [csv_line(format_value(val) for val in row)]
+    if output_format == "markdown":
+        return ["| " + " | ".join(markdown_cell(format_value(val)) for val in row) + " |"]
+    if output_format == "jsonl":
+        return [json.dumps([json_value(val) for val in row])]
+
+    sub_result = [f"{row_number}. row"]
+    for col, val in zip(keys, row):
+        sub_result.append(f"{col}: {format_value(val)}")
+    sub_result.append("")
+    return sub_result
+
+
+# Formats execute_query accepts; "auto" picks the densest of AUTO_FORMATS for the result
+OUTPUT_FORMATS = ("vertical", "tsv", "csv", "markdown", "jsonl", "auto")
+AUTO_FORMATS = ("vertical", "tsv")
+AUTO_SAMPLE_ROWS = 20
+
+
+TOKEN_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text):
+    """Rough BPE token count: words and digit runs split into ~4 and ~3 character pieces,
+    line breaks and every other non-space character are a token of their own"""
+    tokens = text.count("\n")
+    for match in TOKEN_RE.finditer(text):
+        length = match.end() - match.start()
+        if length == 1:
+            tokens += 1
+        elif text[match.start()].isdigit():
+            tokens += (length + 2) // 3
+        else:
+            tokens += (length + 3) // 4
+    return tokens
+
+
+def lines_size(lines):
+    """Cost of output lines in the units of OUTPUT_BUDGET_MODE"""
+    if OUTPUT_BUDGET_MODE == "tokens":
+        return sum(estimate_tokens(x) + 1 for x in lines)  # +1 is for line endings
+    return sum(len(x) + 1 for x in lines)  # +1 is for line endings
+
+
+def query_output_budget():
+    if OUTPUT_BUDGET_MODE == "tokens":
+        return EXECUTE_QUERY_MAX_TOKENS
+    return EXECUTE_QUERY_MAX_CHARS
+
+
+def budget_description(budget):
+    unit = "estimated tokens" if OUTPUT_BUDGET_MODE == "tokens" else "characters"
+    return f"{budget} {unit}"
+
+
+def size_report(output):
+    """Append the size of the output in characters and estimated tokens"""
+    return f"{output}\nOutput: {len(output)} chars, ~{estimate_tokens(output)} tokens"
+
+
+def choose_format(keys, sample_rows):
+    """Pick the format that renders the sample rows in the fewest characters"""
+
+    def cost(output_format):
+        return lines_size(format_header(output_format, keys)) + sum(
+            lines_size(format_row(output_format, keys, i, row))
+            for i, row in enumerate(sample_rows, 1)
+        )
+
+    return min(AUTO_FORMATS, key=cost)
+
+
+FormattedResult = namedtuple(
+    "FormattedResult", ["lines", "last_row", "unshown_rows", "output_format"]
+)
+
+
+def format_result(
+    cursor_result, first_row=1, pending_rows=(), output_format="vertical", budget=None
+):
+    """Format rows in the given output format until the output budget (by default the
+    execute_query one) is spent.
+
+    Rows are numbered from first_row; pending_rows, rows already read from the cursor, are shown
+    before the cursor's next rows. Returns the output lines, the number of the last row shown,
+    the rows read but not shown (empty if all rows were shown) and the format used, which "auto"
+    resolves to a concrete one.
+    """
+    if budget is None:
+        budget = query_output_budget()
+    started = time.perf_counter()
+    keys = list(cursor_result.keys())
+
+    reader = RowReader(cursor_result)
+    # Rows read ahead of the output: pending ones, then the sample "auto" decides on
+    buffered = deque(pending_rows)
+    if output_format == "auto":
+        buffered.extend(islice(reader, max(0, AUTO_SAMPLE_ROWS - len(buffered))))
+        output_format = choose_format(keys, list(buffered)[:AUTO_SAMPLE_ROWS])
+
+    def rows():
+        while buffered:
+            yield buffered.popleft()
+        yield from reader
+
+    result = format_header(output_format, keys)
+    size, row_count, overflow_row = lines_size(result), first_row - 1, None
+
+    for row in rows():
+        row_count += 1
+
+        sub_result = format_row(output_format, keys, row_count, row)
+        size += lines_size(sub_result)
+
+        if size > budget:
+            overflow_row = row
+            break
+        else:
+            result.extend(sub_result)
+
+    record_phase("fetch", reader.seconds)
+    record_phase("format", time.perf_counter() - started - reader.seconds)
+    record_rows(reader.fetched, row_count - first_row + (overflow_row is None))
+
+    if row_count < first_row:
+        return FormattedResult(["No rows returned"], row_count, [], output_format)
+    elif overflow_row is not None:
+        shown = f"first {row_count-1}" if first_row == 1 else f"rows {first_row}-{row_count-1}"
+        result.append(f"Result: showing {shown} of {row_count}+ rows (more available)")
+        return FormattedResult(result, row_count - 1, [overflow_row, *buffered], output_format)
+    else:
+        result.append(f"Result: {row_count} rows")
+        return FormattedResult(result, row_count, [], output_format)
+
+
 def execute_query_description():
     parts = [
-        f"Execute a SQL query and return results in a readable format. Results will be truncated after {EXECUTE_QUERY_MAX_CHARS} characters."
+        "Execute a SQL query and return results in a readable format. Results will be truncated after "
+        f"{budget_description(query_output_budget())}."
     ]
     if READ_ONLY_MODE:
         parts.append(
             "READ-ONLY MODE: Only SELECT queries are allowed. CUD operations (CREATE, UPDATE, DELETE) are blocked."
         )
+    parts.append(
+        "Set count_total=true to also report the total number of rows the query matches. "
+        "Truncated results end with a continuation token; pass it to fetch_more for the next rows."
+    )
+    parts.append(
+        "The format parameter selects the output layout: 'vertical' (one 'column: value' line per "
+        "column), 'tsv', 'csv', 'markdown' (table), 'jsonl' (column list, then one JSON array per row) "
+        "or 'auto' (the most compact for the result). Header-once formats fit many more rows."
+    )
+    if QUERY_COST_GUARD in ("warn", "reject"):
+        verdict = "are rejected" if QUERY_COST_GUARD == "reject" else "get a warning"
+        parts.append(
+            f"Queries whose plan reads {FULL_SCAN_ROW_THRESHOLD:,} rows or more in a full table scan "
+            f"{verdict} (a LIMIT bounds the rows read); check plans first with explain_query."
+        )
+    timeout = (
+        f"defaults to {EXECUTE_QUERY_TIMEOUT:g} seconds" if EXECUTE_QUERY_TIMEOUT else "is off by default"
+    )
+    parts.append(
+        f"Set timeout (seconds, 0 for none) to cancel long-running statements; it {timeout}."
+    )
     parts.append(
         "IMPORTANT: You MUST use the params parameter for query parameter substitution (e.g. 'WHERE id = :id' with "
         "params={'id': 123}) to prevent SQL injection. Direct string concatenation is a serious security risk."
     )
-    parts.append(DB_INFO)
     return " ".join(parts)
 
 
-@mcp.tool(description=execute_query_description())
-def execute_query(query: str, params: dict = None) -> str:
+# SQLite VM instructions between deadline checks of the progress handler
+SQLITE_PROGRESS_STEPS = 10000
+# Extra seconds the server waits past a timeout before interrupting the statement itself
+TIMEOUT_GRACE = 1.0
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+@contextmanager
+def statement_timeout(connection, seconds, session=True):
+    """Bound statements (including fetching their rows) run inside the block to `seconds`,
+    using the dialect's own mechanism where there is one.
+
+    session=False skips the session settings, which take a statement on the connection (that a
+    held cursor being fetched may not allow) and only bound new statements anyway.
+    """
+    if not seconds:
+        yield
+        return
+
+    dialect_name = connection.engine.dialect.name
+    driver_connection = raw_driver_connection(connection)
+    started = time.monotonic()
+    reset = None
+    if dialect_name == "sqlite" and isinstance(driver_connection, sqlite3.Connection):
+        deadline = started + seconds
+        driver_connection.set_progress_handler(
+            lambda: time.monotonic() > deadline, SQLITE_PROGRESS_STEPS
+        )
+        reset = lambda: driver_connection.set_progress_handler(None, 0)
+    elif session and dialect_name == "postgresql":
+        connection.execute(text(f"SET statement_timeout = {int(seconds * 1000)}"))
+        reset = lambda: connection.execute(text("RESET statement_timeout"))
+    elif session and dialect_name in ("mysql", "mariadb"):
+        if getattr(connection.dialect, "is_mariadb", False):
+            variable, value = "max_statement_time", seconds
+        else:
+            variable, value = "max_execution_time", int(seconds * 1000)
+        connection.execute(text(f"SET SESSION {variable} = {value}"))
+        reset = lambda: connection.execute(text(f"SET SESSION {variable} = DEFAULT"))
+
+    try:
+        yield
+    except Exception as e:
+        if time.monotonic() - started >= seconds:
+            raise QueryTimeout(
+                f"Query exceeded the {seconds:g}s timeout and was cancelled"
+            ) from e
+        raise
+    finally:
+        if reset is not None:
+            try:
+                reset()
+            except Exception as e:
+                logger.warning(f"Could not reset statement timeout: {e}")
+
+
+def offset_query(query, dialect_name, offset):
+    """Return the query rewritten to skip `offset` rows, or None if the dialect is not supported"""
+    query = strip_query(query)
+    if dialect_name == "sqlite":
+        return f"SELECT * FROM ({query}) AS mcp_page LIMIT -1 OFFSET {offset}"
+    if dialect_name == "postgresql":
+        return f"SELECT * FROM ({query}) AS mcp_page OFFSET {offset}"
+    if dialect_name in ("mysql", "mariadb"):
+        # MySQL has no OFFSET without LIMIT; this is its documented "all rows" limit
+        return f"SELECT * FROM ({query}) AS mcp_page LIMIT 18446744073709551615 OFFSET {offset}"
+    if dialect_name == "oracle":
+        return f"SELECT * FROM ({query}) mcp_page OFFSET {offset} ROWS"
+    return None
+
+
+def stream_query(
+    connection, statement, params, limited=False, output_format="vertical", budget=None
+):
+    """Execute a statement for streaming, applying cell projection and the auto limit to SELECTs"""
+    with phase("execute"):
+        return execute_streaming(connection, statement, params, limited, output_format, budget)
+
+
+def execute_streaming(connection, statement, params, limited, output_format, budget):
+    dialect_name = connection.engine.dialect.name
+    original, length_columns = statement, None
+    if is_select_query(statement):
+        if EXECUTE_QUERY_CELL_PROJECTION:
+            statement, length_columns = project_cells(connection, statement, params)
+        if limited:
+            limit = auto_limit_rows(output_format, budget)
+            statement = limit_query(statement, dialect_name, limit) or statement
+
+    # Execute query directly since AUTOCOMMIT is enabled
+    # Stream rows (server-side cursor where supported) so only what is shown gets fetched
+    options = {"stream_results": True, "max_row_buffer": EXECUTE_QUERY_FETCH_SIZE}
+    try:
+        cursor_result = connection.execute(text(statement), params, execution_options=options)
+    except DBAPIError as e:
+        if statement == original or not is_duplicate_column_error(dialect_name, e):
+            raise
+        cursor_result = None
+    if cursor_result is not None and statement != original and renamed_duplicates(cursor_result.keys()):
+        # SQLite accepts the wrap but renames repeated names (id, id:1)
+        cursor_result.close()
+        cursor_result = None
+    if cursor_result is None:
+        # Run the query as written; streaming still stops fetching once the budget is spent
+        length_columns = None
+        cursor_result = connection.execute(text(original), params, execution_options=options)
+    if length_columns:
+        return ProjectedResult(cursor_result, length_columns)
+    return cursor_result
+
+
+def cursor_holding_safe(connection):
+    """Whether an open read cursor leaves the database writable by others. SQLite outside WAL mode
+    keeps a SHARED lock for as long as the cursor is open, so other writers get "database is
+    locked" until it is released."""
+    if connection.engine.dialect.name != "sqlite":
+        return True
+    journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+    return str(journal_mode).lower() in ("wal", "memory")
+
+
+def paginate(output, continuation, last_row, unshown_rows, cursor_result, hold):
+    """Attach a continuation token to truncated output, keeping the cursor open if hold is set"""
+    if not unshown_rows or last_row == continuation.rows_shown:
+        # Either everything was shown or a single row exceeds the budget and paging cannot advance
+        if continuation.held:
+            continuation.release()
+        else:
+            cursor_result.close()
+        return output
+    continuation.rows_shown = last_row
+    continuation.last_used = time.monotonic()
+    if hold:
+        continuation.cursor_result = cursor_result
+        continuation.pending_rows = unshown_rows
+    else:
+        cursor_result.close()
+    token = CONTINUATIONS.add(continuation)
+    output.append(
+        f"{CONTINUATION_PREFIX}{token} (call fetch_more with it to get the next rows)"
+    )
+    return output
+
+
+def run_query(
+    connection,
+    query,
+    params,
+    count_total=False,
+    hold_cursor=False,
+    output_format="vertical",
+    timeout=0,
+    budget=None,
+):
+    """Execute a query on the connection and return the formatted output.
+
+    With hold_cursor the caller hands over the connection: it is closed here unless a truncated
+    result keeps it open for fetch_more. budget overrides the execute_query output budget.
+    """
+    held = False
+    try:
+        with statement_timeout(connection, timeout):
+            output, held = execute_and_format(
+                connection, query, params, count_total, hold_cursor, output_format, budget, timeout
+            )
+        return output
+    finally:
+        if hold_cursor and not held:
+            connection.close()
+
+
+def execute_and_format(
+    connection, query, params, count_total, hold_cursor, output_format, budget, timeout=0
+):
+    """Body of run_query; returns the output and whether the cursor is held for fetch_more"""
+    dialect_name = connection.engine.dialect.name
+    is_select = is_select_query(query)
+    limited = EXECUTE_QUERY_AUTO_LIMIT and is_select
+
+    warning = None
+    # WITH and parenthesized queries scan tables as well, so the guard explains them too
+    if QUERY_COST_GUARD in ("warn", "reject") and is_read_query(query):
+        limit = auto_limit_rows(output_format, budget) if limited else None
+        warning = check_query_cost(connection, query, params, limit)
+
+    # Count first: some drivers cannot run a second statement while a streamed result is open
+    total = None
+    if count_total and is_select:
+        try:
+            with phase("execute"):
+                total = connection.execute(
+                    text(count_query(query, dialect_name)), params
+                ).scalar()
+        except Exception as e:
+            total = f"unavailable ({e})"
+
+    cursor_result = stream_query(connection, query, params, limited, output_format, budget)
+
+    if not cursor_result.returns_rows:
+        # For statements like INSERT, UPDATE, DELETE, rowcount gives the number of affected rows.
+        # AUTOCOMMIT ensures changes are committed automatically.
+        return f"Success: {cursor_result.rowcount} rows affected", False
+
+    output, last_row, unshown_rows, output_format = format_result(
+        cursor_result, output_format=output_format, budget=budget
+    )
+    if total is not None:
+        output.append(f"Total rows: {total}")
+    if warning:
+        output.insert(0, warning)
+
+    # A LIMIT-rewritten cursor ends early, so such results resume by re-executing instead
+    hold = hold_cursor and not limited and bool(unshown_rows) and cursor_holding_safe(connection)
+    continuation = Continuation(
+        query, params, 0, output_format, columns=list(cursor_result.keys()), timeout=timeout
+    )
+    output = paginate(output, continuation, last_row, unshown_rows, cursor_result, hold)
+    return "\n".join(output), continuation.held
+
+
+def resume_query(connection, continuation):
+    """fetch_more for a continuation without a held cursor: re-execute and skip shown rows"""
+    with statement_timeout(connection, continuation.timeout):
+        return reexecute_page(connection, continuation)
+
+
+def reexecute_page(connection, continuation):
+    """Body of resume_query"""
+    dialect_name = connection.engine.dialect.name
+    skip = continuation.rows_shown
+    statement = offset_query(continuation.query, dialect_name, skip)
+    if statement is None:
+        statement = continuation.query
+    else:
+        skip = 0
+
+    def execute(statement, skip):
+        # A LIMIT would also count the rows skipped client side
+        limited = EXECUTE_QUERY_AUTO_LIMIT and not skip
+        return stream_query(
+            connection, statement, continuation.params, limited, continuation.output_format
+        )
+
+    try:
+        cursor_result = execute(statement, skip)
+    except DBAPIError as e:
+        if statement == continuation.query or not is_duplicate_column_error(dialect_name, e):
+            raise
+        # The OFFSET wrap repeats column names of a join, which MySQL and Oracle refuse
+        statement, skip = continuation.query, continuation.rows_shown
+        cursor_result = execute(statement, skip)
+    else:
+        renamed = continuation.columns is not None and list(cursor_result.keys()) != continuation.columns
+        if statement != continuation.query and renamed:
+            # SQLite accepts the wrap but renames repeated names (id, id:1)
+            cursor_result.close()
+            statement, skip = continuation.query, continuation.rows_shown
+            cursor_result = execute(statement, skip)
+    # Without an OFFSET rewrite the shown rows are skipped client side
+    for _ in range(skip):
+        if cursor_result.fetchone() is None:
+            break
+
+    output, last_row, unshown_rows, _ = format_result(
+        cursor_result, continuation.rows_shown + 1, (), continuation.output_format
+    )
+    output = paginate(output, continuation, last_row, unshown_rows, cursor_result, False)
+    return "\n".join(output)
+
+
+def resume_held_cursor(continuation):
+    """fetch_more for a continuation holding an open cursor"""
+    cursor_result = continuation.cursor_result
+    with statement_timeout(cursor_result.connection, continuation.timeout, session=False):
+        output, last_row, unshown_rows, _ = format_result(
+            cursor_result,
+            continuation.rows_shown + 1,
+            continuation.pending_rows,
+            continuation.output_format,
+        )
+    if not unshown_rows:
+        continuation.release()
+        return "\n".join(output)
+    return "\n".join(
+        paginate(output, continuation, last_row, unshown_rows, cursor_result, True)
+    )
+
+
+@db_tool(execute_query_description())
+async def execute_query(
+    query: str,
+    params: dict = None,
+    count_total: bool = False,
+    format: str = EXECUTE_QUERY_FORMAT,
+    timeout: float = None,
+) -> str:
     # Check if read-only mode is enabled and query is a CUD operation
     if READ_ONLY_MODE and is_cud_operation(query):
         return "Error: READ-ONLY MODE is enabled. Only SELECT queries are allowed. CUD operations (CREATE, UPDATE, DELETE) are blocked."
@@ -246,73 +3420,203 @@ def execute_query(query: str, params: dict = None) -> str:
     if params is None:
         params = {}
 
-    def format_value(val):
-        """Format a value for display, handling None and datetime types"""
-        if val is None:
-            return "NULL"
-        if isinstance(val, (datetime, date)):
-            return val.isoformat()
-        return str(val)
-
-    def format_result(cursor_result):
-        """Format rows in a clean vertical format"""
-        result = []
-        size, row_count, did_truncate = 0, 0, False
-
-        # Make the cursor result iterable
-        rows = list(cursor_result)
-        keys = cursor_result.keys()
-
-        for row in rows:
-            row_count += 1
-            if did_truncate:
-                continue
+    output_format = format.lower().strip()
+    if output_format not in OUTPUT_FORMATS:
+        return f"Error: Unknown format '{format}'. Use one of: {', '.join(OUTPUT_FORMATS)}."
 
-            sub_result = [f"{row_count}. row"]
-            for col, val in zip(keys, row):
-                sub_result.append(f"{col}: {format_value(val)}")
-            sub_result.append("")
+    if timeout is None:
+        timeout = EXECUTE_QUERY_TIMEOUT
 
-            size += sum(len(x) + 1 for x in sub_result)  # +1 is for line endings
+    # Only plain SELECTs are cached and coalesced; anything else may write and invalidates what it touches
+    read_only = is_select_query(query) and not is_cud_operation(query)
+    if not read_only:
+        output = report_size(
+            await run_statement(query, params, count_total, output_format, timeout)
+        )
+        if RESULT_CACHE_ENABLED:
+            RESULT_CACHE.invalidate(database_identity(), write_targets(query))
+        return output
 
-            if size > EXECUTE_QUERY_MAX_CHARS:
-                did_truncate = True
-                break
-            else:
-                result.extend(sub_result)
+    cache_key = RESULT_CACHE.make_key(
+        database_identity(), query, params, count_total, output_format
+    )
+    if RESULT_CACHE_ENABLED:
+        cached = RESULT_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
+    output = report_size(
+        await coalesce(
+            ("execute_query", cache_key, timeout),
+            lambda: run_statement(query, params, count_total, output_format, timeout),
+        )
+    )
+    # Continuation tokens are single use, so paginated output is never cached
+    cacheable = not output.startswith("Error:") and CONTINUATION_PREFIX not in output
+    if RESULT_CACHE_ENABLED and cacheable:
+        RESULT_CACHE.put(cache_key, output, query_identifiers(query))
+    return output
 
-        if row_count == 0:
-            return ["No rows returned"]
-        elif did_truncate:
-            result.append(
-                f"Result: showing first {row_count-1} rows (output truncated)"
+
+async def run_statement(query, params, count_total, output_format, timeout, budget=None):
+    """Run a statement for execute_query(ies), returning its output or an error string.
+
+    Only statements run with the default budget (single execute_query calls) may hold a cursor.
+    """
+    # The connection is handed to run_query so a truncated result can keep its cursor open
+    hold_cursor = budget is None and not ASYNC_MODE and CONTINUATIONS.reserve_hold()
+    running = run_db(
+        run_query,
+        query,
+        params,
+        count_total,
+        hold_cursor,
+        output_format,
+        timeout,
+        budget,
+        connection_handoff=hold_cursor,
+    )
+    try:
+        # Backstop for dialects the statement timeout does not reach: cancelling interrupts the query
+        output = await asyncio.wait_for(running, timeout + TIMEOUT_GRACE if timeout else None)
+    except asyncio.TimeoutError as e:
+        record_error(e)
+        return f"Error: Query exceeded the {timeout:g}s timeout and was cancelled"
+    except Exception as e:
+        record_error(e)
+        return f"Error: {str(e)}"
+    finally:
+        if hold_cursor:
+            CONTINUATIONS.release_hold()
+    return output
+
+
+def report_size(output):
+    return output if output.startswith("Error:") else size_report(output)
+
+
+@db_tool(
+    f"Run up to {EXECUTE_QUERIES_MAX_QUERIES} read-only queries concurrently (at most "
+    f"{EXECUTE_QUERIES_CONCURRENCY} at a time, fewer if the connection pool has fewer free "
+    "connections) and return their results in order, each headed "
+    "'Query N:'. Each item of queries is {'query': ..., 'params': {...}}, with params used as "
+    "in execute_query. The queries share the execute_query output budget equally; truncated "
+    "results end with a continuation token for fetch_more. CUD operations are refused, run them "
+    "with execute_query."
+)
+async def execute_queries(queries: list[dict], format: str = EXECUTE_QUERY_FORMAT) -> str:
+    if not queries:
+        return "Error: No queries given."
+    if len(queries) > EXECUTE_QUERIES_MAX_QUERIES:
+        return f"Error: At most {EXECUTE_QUERIES_MAX_QUERIES} queries can be run at once."
+    output_format = format.lower().strip()
+    if output_format not in OUTPUT_FORMATS:
+        return f"Error: Unknown format '{format}'. Use one of: {', '.join(OUTPUT_FORMATS)}."
+
+    budget = query_output_budget() // len(queries)
+    # More queries than free pool connections would wait on pool checkout (up to its timeout);
+    # POOL_MODE=adaptive sizes the pool for more
+    concurrency = EXECUTE_QUERIES_CONCURRENCY
+    free = pool_free_connections(get_engine())
+    if free is not None:
+        concurrency = max(1, min(concurrency, free))
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run(item):
+        query = item.get("query") if isinstance(item, dict) else None
+        if not isinstance(query, str) or not query.strip():
+            return "Error: Each item needs a 'query' string."
+        if is_cud_operation(query):
+            return "Error: execute_queries only runs read-only statements. Use execute_query for CUD operations."
+        async with slots:
+            return await run_statement(
+                query, item.get("params") or {}, False, output_format, EXECUTE_QUERY_TIMEOUT, budget
             )
-            return result
-        else:
-            result.append(f"Result: {row_count} rows")
-            return result
+
+    outputs = await asyncio.gather(*(run(item) for item in queries))
+    return size_report(
+        "\n\n".join(f"Query {i}:\n{output}" for i, output in enumerate(outputs, 1))
+    )
+
+
+@db_tool(
+    "Show the query plan of a SQL query without running it (EXPLAIN QUERY PLAN on SQLite, EXPLAIN "
+    "on PostgreSQL and MySQL), followed by the full table scans it does with estimated row counts. "
+    f"Scans of tables with {FULL_SCAN_ROW_THRESHOLD:,} rows or more are flagged. Pass params as "
+    "for execute_query."
+)
+async def explain_query(query: str, params: dict = None) -> str:
+    if params is None:
+        params = {}
 
     try:
-        with get_connection() as connection:
-            # Execute query directly since AUTOCOMMIT is enabled
-            cursor_result = connection.execute(text(query), params)
+        plan = await run_db(explain_plan, query, params)
+    except Exception as e:
+        record_error(e)
+        return f"Error: {str(e)}"
+    if plan is None:
+        return "Error: explain_query supports SQLite, PostgreSQL and MySQL databases only."
 
-            if not cursor_result.returns_rows:
-                # For statements like INSERT, UPDATE, DELETE, rowcount gives the number of affected rows.
-                # AUTOCOMMIT ensures changes are committed automatically.
-                return f"Success: {cursor_result.rowcount} rows affected"
+    output = list(plan.lines)
+    if plan.scans:
+        output.append(f"\nFull scans: {', '.join(describe_scan(scan) for scan in plan.scans)}")
+    else:
+        output.append("\nFull scans: none")
+    scans = large_scans(plan)
+    if scans:
+        output.append(f"Cost guard: {describe_large_scans(scans)}")
+    return "\n".join(output)
 
-            output = format_result(cursor_result)
 
-            return "\n".join(output)
+@mcp.tool(
+    description="Return the next rows of a truncated execute_query or fetch_more result, given the "
+    f"continuation token printed at its end. Tokens are single use and expire after "
+    f"{PAGINATION_IDLE_TIMEOUT:g} seconds without use. Queries may be re-executed to get further "
+    "rows, so give them an ORDER BY for stable pages."
+)
+@metered
+async def fetch_more(token: str) -> str:
+    continuation = CONTINUATIONS.pop(token.strip())
+    if continuation is None:
+        return "Error: Unknown or expired continuation token. Re-run the query with execute_query."
+
+    held = continuation.held
+    timeout = continuation.timeout
+    if held:
+        running = run_held(resume_held_cursor, continuation)
+    else:
+        running = run_db(resume_query, continuation)
+    try:
+        # Same backstop as run_statement: cancelling interrupts the statement
+        return size_report(
+            await asyncio.wait_for(running, timeout + TIMEOUT_GRACE if timeout else None)
+        )
+    except asyncio.TimeoutError as e:
+        record_error(e)
+        continuation.release()
+        return f"Error: Query exceeded the {timeout:g}s timeout and was cancelled"
     except Exception as e:
+        record_error(e)
+        continuation.release()
         return f"Error: {str(e)}"
+    finally:
+        if held:
+            CONTINUATIONS.release_hold()
+
+
+record_startup_phase("import", IMPORT_STARTED)
 
 
 def main():
     """
     Main function to run the MCP server.
     """
+    if SCHEMA_SNAPSHOT_PATH:
+        started = time.perf_counter()
+        load_schema_snapshot()
+        record_startup_phase("schema_snapshot", started)
+    if LAZY_INIT or SCHEMA_SNAPSHOT_PATH:
+        start_warm_up()
     # Run the MCP server over HTTP on localhost port 8080
     mcp.run(transport="http", host="0.0.0.0", port=8080)
 
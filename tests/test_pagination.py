@@ -0,0 +1,134 @@
+import re
+import asyncio
+import sqlite3
+
+import pytest
+
+import sql_server
+
+PAGES = 6
+
+
+def call(tool, *args, **kwargs):
+    return asyncio.run(getattr(tool, "fn", tool)(*args, **kwargs))
+
+
+def expected_ids(table_name):
+    with sqlite3.connect("latest_db.db") as conn:
+        return [row[0] for row in conn.execute(f"SELECT id FROM {table_name} ORDER BY id")]
+
+
+def paged_ids(table_name, output_format):
+    """Row ids shown over the first PAGES pages, read from a marker column present in every format"""
+    query = f"SELECT 'row' || id || 'x' AS marker, * FROM {table_name} ORDER BY id"
+    return ids_shown(paged_outputs(query, output_format))
+
+
+def paged_outputs(query, output_format):
+    """Outputs of the first PAGES pages of a query"""
+    output = call(sql_server.execute_query, query, format=output_format)
+    outputs = []
+    for _ in range(PAGES):
+        assert not output.startswith("Error:"), output
+        outputs.append(output)
+        token = re.search(r"Continuation token: (\S+)", output)
+        if token is None:
+            return outputs
+        output = call(sql_server.fetch_more, token.group(1))
+
+    # Free a held cursor for the next test
+    token = re.search(r"Continuation token: (\S+)", output)
+    if token:
+        sql_server.CONTINUATIONS.discard(token.group(1))
+    return outputs
+
+
+def ids_shown(outputs):
+    return [int(x) for output in outputs for x in re.findall(r"\brow(\d+)x\b", output)]
+
+
+@pytest.fixture(params=["held", "re-executed"])
+def pagination(request, monkeypatch):
+    monkeypatch.setattr(sql_server, "SINGLE_FLIGHT_ENABLED", False)
+    monkeypatch.setattr(sql_server, "RESULT_CACHE_ENABLED", False)
+    if request.param == "re-executed":
+        monkeypatch.setattr(sql_server.CONTINUATIONS, "reserve_hold", lambda: False)
+    else:
+        # latest_db.db is not in WAL mode, where holding would block writers
+        monkeypatch.setattr(sql_server, "cursor_holding_safe", lambda connection: True)
+        assert sql_server.CONTINUATIONS.can_hold()
+    return request.param
+
+
+@pytest.mark.parametrize("output_format", sql_server.OUTPUT_FORMATS)
+@pytest.mark.parametrize("table_name", ["attachment", "pipeline_version"])
+def test_row_ids_continue_across_pages(pagination, table_name, output_format):
+    ids = paged_ids(table_name, output_format)
+    assert len(ids) > 1
+    assert ids == expected_ids(table_name)[: len(ids)]
+
+
+@pytest.mark.parametrize("output_format", sql_server.OUTPUT_FORMATS)
+@pytest.mark.parametrize(
+    "rewrite", [None, "EXECUTE_QUERY_AUTO_LIMIT", "EXECUTE_QUERY_CELL_PROJECTION"]
+)
+def test_repeated_column_names_keep_their_names_across_pages(
+    pagination, rewrite, output_format, monkeypatch
+):
+    if rewrite:
+        monkeypatch.setattr(sql_server, rewrite, True)
+    outputs = paged_outputs(
+        "SELECT 'row' || a.id || 'x' AS marker, a.id, a.name, b.id, b.name "
+        "FROM attachment a JOIN attachment b ON b.id = a.id ORDER BY a.id",
+        output_format,
+    )
+    assert len(outputs) > 1
+    for output in outputs:
+        assert "id:1" not in output and "name:1" not in output, output
+    ids = ids_shown(outputs)
+    assert ids == expected_ids("attachment")[: len(ids)]
+
+
+def test_concurrent_queries_hold_at_most_max_held_cursors(monkeypatch):
+    monkeypatch.setattr(sql_server, "SINGLE_FLIGHT_ENABLED", False)
+    monkeypatch.setattr(sql_server, "RESULT_CACHE_ENABLED", False)
+    monkeypatch.setattr(sql_server, "cursor_holding_safe", lambda connection: True)
+    queries = [f"SELECT {i} AS n, * FROM attachment ORDER BY id" for i in range(3)]
+
+    async def run_all():
+        execute_query = getattr(sql_server.execute_query, "fn", sql_server.execute_query)
+        return await asyncio.gather(*(execute_query(query, format="tsv") for query in queries))
+
+    outputs = asyncio.run(run_all())
+    tokens = [re.search(r"Continuation token: (\S+)", output) for output in outputs]
+    assert all(tokens), outputs
+    try:
+        assert sql_server.CONTINUATIONS.held() == sql_server.CONTINUATIONS.max_held
+        assert sql_server.pool_free_connections(sql_server.get_engine()) > 0
+    finally:
+        for token in tokens:
+            sql_server.CONTINUATIONS.discard(token.group(1))
+    assert sql_server.CONTINUATIONS.held() == 0
+
+
+def test_sqlite_outside_wal_mode_does_not_hold_cursors(monkeypatch):
+    monkeypatch.setattr(sql_server, "SINGLE_FLIGHT_ENABLED", False)
+    monkeypatch.setattr(sql_server, "RESULT_CACHE_ENABLED", False)
+    output = call(sql_server.execute_query, "SELECT * FROM attachment ORDER BY id", format="tsv")
+    token = re.search(r"Continuation token: (\S+)", output)
+    assert token, output
+    try:
+        assert sql_server.CONTINUATIONS.held() == 0
+        # Another process could write: taking the exclusive lock needs no open reader
+        with sqlite3.connect("latest_db.db", timeout=0) as conn:
+            conn.execute("BEGIN EXCLUSIVE")
+            conn.rollback()
+    finally:
+        sql_server.CONTINUATIONS.discard(token.group(1))
+
+
+def test_cell_projection_skips_queries_repeating_column_names():
+    query = "SELECT a.id, a.name, b.id, b.name FROM attachment a JOIN attachment b ON b.id = a.id"
+    with sql_server.get_engine().connect() as connection:
+        statement, length_columns = sql_server.project_cells(connection, query, {})
+    assert (statement, length_columns) == (query, None)
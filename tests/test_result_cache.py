@@ -0,0 +1,52 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import sql_server
+
+
+def call(tool, *args, **kwargs):
+    return asyncio.run(getattr(tool, "fn", tool)(*args, **kwargs))
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A small writable database in place of latest_db.db, with the result cache on"""
+    path = tmp_path / "cache.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("CREATE TABLE tag (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO item VALUES (1, 'old')")
+        conn.execute("INSERT INTO tag VALUES (1, 'old')")
+    monkeypatch.setenv("DB_URL", f"sqlite:///{path}")
+    monkeypatch.setattr(sql_server, "ENGINE", None)
+    monkeypatch.setattr(sql_server, "READ_ONLY_MODE", False)
+    monkeypatch.setattr(sql_server, "RESULT_CACHE_ENABLED", True)
+    monkeypatch.setattr(
+        sql_server, "RESULT_CACHE", sql_server.ResultCache(60, 100, 1024 * 1024)
+    )
+    yield path
+    sql_server.get_engine().dispose()
+
+
+def rename_outside_the_server(path, table_name):
+    with sqlite3.connect(path) as conn:
+        conn.execute(f"UPDATE {table_name} SET name = 'new'")
+
+
+def test_write_invalidates_cached_selects_of_its_table(database):
+    item_query, tag_query = "SELECT name FROM item", "SELECT name FROM tag"
+    assert "old" in call(sql_server.execute_query, item_query, format="tsv")
+    assert "old" in call(sql_server.execute_query, tag_query, format="tsv")
+
+    # Served from the cache: changes made behind the server's back do not show
+    rename_outside_the_server(database, "item")
+    rename_outside_the_server(database, "tag")
+    assert "old" in call(sql_server.execute_query, item_query, format="tsv")
+
+    output = call(sql_server.execute_query, "UPDATE item SET name = 'newer' WHERE id = 1")
+    assert output.startswith("Success: 1 rows affected"), output
+    assert "newer" in call(sql_server.execute_query, item_query, format="tsv")
+    # Tables the write did not touch stay cached
+    assert "old" in call(sql_server.execute_query, tag_query, format="tsv")
@@ -0,0 +1,98 @@
+import re
+import asyncio
+
+import pytest
+
+import sql_server
+
+QUERY = "SELECT * FROM attachment ORDER BY id"
+
+
+def tool(name):
+    return getattr(getattr(sql_server, name), "fn", getattr(sql_server, name))
+
+
+@pytest.fixture
+def single_flight(monkeypatch):
+    monkeypatch.setattr(sql_server, "SINGLE_FLIGHT_ENABLED", True)
+    monkeypatch.setattr(sql_server, "RESULT_CACHE_ENABLED", False)
+    monkeypatch.setattr(sql_server, "SINGLE_FLIGHT", sql_server.SingleFlight())
+    return sql_server.SINGLE_FLIGHT
+
+
+def test_identical_calls_execute_once_with_a_token_each(single_flight):
+    executed = []
+
+    def count(conn, cursor, statement, *args):
+        if statement.strip() == QUERY:
+            executed.append(statement)
+
+    engine = getattr(sql_server.get_engine(), "sync_engine", sql_server.get_engine())
+    sql_server.event.listen(engine, "before_cursor_execute", count)
+
+    async def run_all():
+        outputs = await asyncio.gather(*(tool("execute_query")(QUERY, format="tsv") for _ in range(3)))
+        tokens = [re.search(r"Continuation token: (\S+)", output).group(1) for output in outputs]
+        next_pages = [await tool("fetch_more")(token) for token in tokens]
+        return outputs, tokens, next_pages
+
+    try:
+        outputs, tokens, next_pages = asyncio.run(run_all())
+    finally:
+        sql_server.event.remove(engine, "before_cursor_execute", count)
+
+    assert (single_flight.executions, single_flight.shared) == (1, 2)
+    assert executed == [QUERY]
+    assert len(set(tokens)) == len(tokens)
+    # The rows up to the token; the size report after it depends on the token
+    rows = lambda output: output.split("Continuation token:")[0]
+    assert len({rows(output) for output in outputs}) == 1
+    assert len({rows(page) for page in next_pages}) == 1
+    assert not next_pages[0].startswith("Error:"), next_pages[0]
+    for page in next_pages:
+        token = re.search(r"Continuation token: (\S+)", page)
+        if token:
+            sql_server.CONTINUATIONS.discard(token.group(1))
+
+
+def test_cancelled_waiter_leaves_the_call_running_for_the_others():
+    async def scenario():
+        flight = sql_server.SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        release.set()
+        return first.cancelled(), await second
+
+    assert asyncio.run(scenario()) == (True, ("done", True))
+
+
+def test_last_waiter_cancelling_stops_the_shared_call():
+    async def scenario():
+        flight = sql_server.SingleFlight()
+        started = asyncio.Event()
+
+        async def work():
+            started.set()
+            await asyncio.sleep(60)
+
+        waiters = [asyncio.ensure_future(flight.do("key", work)) for _ in range(2)]
+        await started.wait()
+        shared_call = flight.calls["key"][0]
+        for waiter in waiters:
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            if waiter is waiters[0]:
+                assert not shared_call.done()
+        await asyncio.gather(shared_call, return_exceptions=True)
+        return shared_call.cancelled(), "key" in flight.calls
+
+    assert asyncio.run(scenario()) == (True, False)
@@ -0,0 +1,37 @@
+import time
+import asyncio
+
+import pytest
+
+import sql_server
+
+# Runs for minutes unless interrupted
+SLOW_QUERY = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) "
+    "SELECT count(*) FROM c"
+)
+
+
+def call(tool, *args, **kwargs):
+    return asyncio.run(getattr(tool, "fn", tool)(*args, **kwargs))
+
+
+@pytest.fixture(autouse=True)
+def uncached(monkeypatch):
+    monkeypatch.setattr(sql_server, "SINGLE_FLIGHT_ENABLED", False)
+    monkeypatch.setattr(sql_server, "RESULT_CACHE_ENABLED", False)
+
+
+def test_sqlite_progress_handler_times_out_and_frees_the_connection():
+    started = time.monotonic()
+    output = call(sql_server.execute_query, SLOW_QUERY, timeout=0.5)
+    elapsed = time.monotonic() - started
+
+    assert output == "Error: Query exceeded the 0.5s timeout and was cancelled"
+    # Stopped by the progress handler, not the grace period backstop
+    assert elapsed < 0.5 + sql_server.TIMEOUT_GRACE
+    assert sql_server.get_engine().pool.checkedout() == 0
+
+    # The connection went back to the pool without the handler still installed
+    output = call(sql_server.execute_query, "SELECT count(*) AS n FROM attachment", format="tsv")
+    assert output.startswith("n\n"), output